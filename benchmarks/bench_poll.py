@@ -0,0 +1,130 @@
+"""Measure the cost of polling simulated routers with DeviceCoordinator.
+
+Starts a local fake rpcd (see fake_rpcd.py), creates one DeviceCoordinator
+per simulated router and times full fast-tier polls of the whole fleet:
+
+    python benchmarks/bench_poll.py --routers 1,10,100,500 --polls 5
+
+Needs Home Assistant installed. The fake server runs in the same process,
+so the CPU figures include the server side.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import os
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from homeassistant.core import HomeAssistant  # noqa: E402
+
+from custom_components.openwrt.coordinator import new_coordinator  # noqa: E402
+from custom_components.openwrt.mesh import MeshRegistry  # noqa: E402
+from custom_components.openwrt.clients import ClientIndex  # noqa: E402
+from fake_rpcd import FakeRouter, FakeRpcd, add_router_arguments  # noqa: E402
+
+
+def router_config(index: int, router: FakeRouter, server: FakeRpcd, args) -> dict:
+    address, port, path = server.url(index)
+    return dict(
+        id=f"bench{index}",
+        address=address,
+        port=port,
+        path=path,
+        https=False,
+        verify_cert=False,
+        username="hass",
+        password="bench",
+        interval=30,
+        wps=args.wps,
+        wan_devices=",".join(router.wan),
+        max_concurrency=args.concurrency,
+    )
+
+
+async def bench(count: int, args) -> dict:
+    routers = [
+        FakeRouter(i, args.aps, args.clients, args.mesh_group, args.wan, snapshot=args.snapshot)
+        for i in range(count)
+    ]
+    server = FakeRpcd(routers, args.latency / 1000, args.call_cost / 1000, not args.no_batch)
+    await server.start()
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass = HomeAssistant(config_dir)
+        mesh = MeshRegistry()
+        clients = ClientIndex()
+        if args.trace_memory:
+            tracemalloc.start()
+        devices = [
+            new_coordinator(hass, router_config(i, router, server, args), mesh, clients, f"bench{i}")
+            for i, router in enumerate(routers)
+        ]
+        for device in devices:
+            device.discovery_coordinator.async_set_updated_data(await device.async_update_discovery())
+        updates = [device.make_async_update_data(device.async_update_fast, "fast") for device in devices]
+
+        # The first round logs in and fills the mesh registry
+        await asyncio.gather(*[update() for update in updates], return_exceptions=True)
+        await hass.async_block_till_done()
+        for router in routers:
+            router.requests = router.calls = 0
+
+        failures = 0
+        cpu = time.process_time()
+        wall = time.perf_counter()
+        for _ in range(args.polls):
+            results = await asyncio.gather(*[update() for update in updates], return_exceptions=True)
+            failures += sum(1 for result in results if isinstance(result, Exception))
+        wall = time.perf_counter() - wall
+        cpu = time.process_time() - cpu
+
+        memory = tracemalloc.get_traced_memory()[0] if args.trace_memory else None
+        if args.trace_memory:
+            tracemalloc.stop()
+        for device in devices:
+            await device.async_shutdown()
+        await hass.async_stop(force=True)
+    await server.stop()
+
+    polls = count * args.polls
+    return dict(
+        routers=count,
+        wall_ms=wall / args.polls * 1000,
+        cpu_ms=cpu / args.polls * 1000,
+        requests=sum(router.requests for router in routers) / polls,
+        calls=sum(router.calls for router in routers) / polls,
+        failures=failures,
+        memory_kb=memory / 1024 if memory is not None else None,
+        maxrss_mb=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--routers", default="1,10,100", help="comma-separated fleet sizes (1-500)")
+    parser.add_argument("--polls", type=int, default=5, help="measured poll rounds per fleet size")
+    parser.add_argument("--concurrency", type=int, default=2, help="max_concurrency option of each router")
+    parser.add_argument("--wps", action="store_true", help="poll WPS status as well")
+    parser.add_argument("--trace-memory", action="store_true", help="measure Python heap with tracemalloc (slower)")
+    add_router_arguments(parser)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    print(f"{'routers':>8} {'wall ms/poll':>13} {'cpu ms/poll':>12} {'req/router':>11} {'calls/router':>13} {'fail':>5} {'heap KB':>9} {'maxrss MB':>10}")
+    for count in [int(value) for value in args.routers.split(",")]:
+        result = asyncio.run(bench(max(1, min(count, 500)), args))
+        heap = f"{result['memory_kb']:9.0f}" if result["memory_kb"] is not None else f"{'-':>9}"
+        print(
+            f"{result['routers']:>8} {result['wall_ms']:>13.1f} {result['cpu_ms']:>12.1f} "
+            f"{result['requests']:>11.2f} {result['calls']:>13.2f} {result['failures']:>5} {heap} {result['maxrss_mb']:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+"""Local stand-in for the rpcd JSON-RPC endpoint of many OpenWrt routers.
+
+Every simulated router is served under its own path prefix,
+`http://127.0.0.1:<port>/<index>/ubus`, with generated fixtures for the
+objects the integration polls. Latency is added per HTTP request (network
+round trip) and per call (rpcd processing time).
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import secrets
+
+from aiohttp import web
+
+SESSION_TIMEOUT = 300
+
+
+def _mac(*parts: int) -> str:
+    return "02:" + ":".join("%02x" % (part & 0xFF) for part in (parts + (0, 0, 0, 0, 0))[:5])
+
+
+class FakeRouter:
+
+    def __init__(
+        self,
+        index: int,
+        aps: int = 2,
+        clients: int = 10,
+        mesh_group: int = 4,
+        wan: int = 1,
+        mwan3: bool = True,
+        snapshot: bool = False,
+    ):
+        self.index = index
+        self.requests = 0
+        self.calls = 0
+        self.sessions = set()
+        self.aps = [f"phy0-ap{n}" for n in range(aps)]
+        self.clients = {
+            ifname: {_mac(0x10, index >> 8, index, n, c): {"signal": -40 - c % 40} for c in range(clients)}
+            for n, ifname in enumerate(self.aps)
+        }
+        self.mesh_group = mesh_group
+        self.mesh_id = f"bench-mesh-{index // mesh_group}" if mesh_group else None
+        self.wan = [f"wan{n}" for n in range(wan)]
+        self.mwan3 = mwan3
+        self.snapshot = snapshot
+
+    @staticmethod
+    def mesh_mac(index: int) -> str:
+        return _mac(0x20, index >> 8, index)
+
+    def mesh_peers(self) -> list:
+        first = (self.index // self.mesh_group) * self.mesh_group
+        return [self.mesh_mac(i) for i in range(first, first + self.mesh_group) if i != self.index]
+
+    def objects(self) -> dict:
+        objects = {
+            "session": {"login": {}, "access": {}},
+            "system": {"board": {}, "info": {}, "reboot": {}},
+            "network.wireless": {"status": {}},
+            "network.device": {"status": {}},
+            "network.interface": {"dump": {}},
+            "iwinfo": {"info": {}, "assoclist": {}},
+            "file": {"exec": {}},
+            "rc": {"init": {}},
+        }
+        for ifname in self.aps:
+            objects[f"hostapd.{ifname}"] = {"get_clients": {}, "wps_status": {}, "wps_start": {}, "wps_cancel": {}}
+        if self.mwan3:
+            objects["mwan3"] = {"status": {}}
+        if self.snapshot:
+            objects["hass"] = {"snapshot": {}}
+        return objects
+
+    def call(self, obj: str, method: str, args: dict):
+        """Return (code, result) like rpcd, or raise KeyError for unknown objects."""
+        objects = self.objects()
+        if obj not in objects:
+            raise KeyError(obj)
+        if method not in objects[obj]:
+            return 3, None
+        base = "hostapd" if obj.startswith("hostapd.") else obj.replace(".", "_")
+        handler = getattr(self, f"_{base}_{method}", None)
+        if handler is None:
+            return 0, {}
+        return handler(obj, args or {})
+
+    def _system_board(self, obj, args):
+        return 0, {
+            "model": f"Bench router {self.index}",
+            "release": {"distribution": "OpenWrt", "version": "23.05.3", "revision": "r23809-234f1a2efa"},
+        }
+
+    def _system_info(self, obj, args):
+        return 0, {"uptime": 3600, "load": [6553, 3276, 1638], "memory": {"total": 128 << 20, "free": 64 << 20}}
+
+    def _network_wireless_status(self, obj, args):
+        interfaces = [
+            {"ifname": ifname, "config": {"mode": "ap", "network": ["lan"]}} for ifname in self.aps
+        ]
+        if self.mesh_id:
+            interfaces.append({"ifname": "phy1-mesh0", "config": {"mode": "mesh", "network": ["lan"], "mesh_id": self.mesh_id}})
+        return 0, {"radio0": {"up": True, "disabled": False, "interfaces": interfaces}}
+
+    def _hostapd_get_clients(self, obj, args):
+        return 0, {"freq": 2412, "clients": self.clients[obj.split(".", 1)[1]]}
+
+    def _hostapd_wps_status(self, obj, args):
+        return 0, {"pbc_status": "Disabled"}
+
+    def _iwinfo_info(self, obj, args):
+        if args.get("device") != "phy1-mesh0" or not self.mesh_id:
+            return 2, None
+        return 0, {"bssid": self.mesh_mac(self.index).upper(), "signal": -55, "noise": -95, "bitrate": 300000}
+
+    def _iwinfo_assoclist(self, obj, args):
+        stations = [
+            {"mac": mac.upper(), "signal": -60, "noise": -95, "mesh plink": "ESTAB"}
+            for mac in self.mesh_peers()
+        ]
+        if "mac" in args:
+            for station in stations:
+                if station["mac"].lower() == args["mac"].lower():
+                    return 0, station
+            return 2, None
+        return 0, {"results": stations}
+
+    def _mwan3_status(self, obj, args):
+        return 0, {"interfaces": {
+            name: {"enabled": True, "status": "online", "online": 3000, "offline": 0, "uptime": 3000, "up": True}
+            for name in self.wan
+        }}
+
+    def _device_status(self, name: str) -> dict:
+        return {
+            "up": True,
+            "speed": "1000F",
+            "macaddr": _mac(0x30, self.index >> 8, self.index),
+            "statistics": {"rx_bytes": self.requests * 1500, "tx_bytes": self.requests * 500},
+        }
+
+    def _network_device_status(self, obj, args):
+        if "name" in args:
+            if args["name"] not in self.wan:
+                return 4, None
+            return 0, self._device_status(args["name"])
+        return 0, {name: self._device_status(name) for name in self.wan + ["br-lan"]}
+
+    def _network_interface_dump(self, obj, args):
+        return 0, {"interface": [
+            {"interface": name, "up": True, "device": name, "route": [{"target": "0.0.0.0", "mask": 0}]}
+            for name in self.wan
+        ]}
+
+    def _file_exec(self, obj, args):
+        # Behaves like `echo`, one output line per argument
+        return 0, {"code": 0, "stdout": "\n".join(args.get("params", [])) + "\n", "stderr": ""}
+
+    def _hass_snapshot(self, obj, args):
+        # Same layout as custom_components/openwrt/rpcd/hass.uc builds on a router
+        def value(reply):
+            return reply[1] if reply[0] == 0 else None
+
+        snapshot = {
+            "info": value(self._system_info("system", {})),
+            "devices": value(self._network_device_status("network.device", {})),
+            "mwan3": value(self._mwan3_status("mwan3", {"section": "interfaces"})) if self.mwan3 else None,
+            "hostapd": {
+                ifname: {
+                    "clients": value(self._hostapd_get_clients(f"hostapd.{ifname}", {})),
+                    "wps": value(self._hostapd_wps_status(f"hostapd.{ifname}", {})) if args.get("wps") else None,
+                }
+                for ifname in self.aps
+            },
+            "iwinfo": {},
+        }
+        if self.mesh_id:
+            snapshot["iwinfo"]["phy1-mesh0"] = {
+                "info": value(self._iwinfo_info("iwinfo", {"device": "phy1-mesh0"})),
+                "assoclist": value(self._iwinfo_assoclist("iwinfo", {"device": "phy1-mesh0"})),
+            }
+        return 0, snapshot
+
+    def _session_login(self, obj, args):
+        session = secrets.token_hex(16)
+        self.sessions.add(session)
+        return 0, {"ubus_rpc_session": session, "timeout": SESSION_TIMEOUT, "expires": SESSION_TIMEOUT}
+
+
+class FakeRpcd:
+
+    def __init__(self, routers: list, latency: float = 0.0, call_cost: float = 0.0, batch: bool = True):
+        self.routers = routers
+        self.latency = latency
+        self.call_cost = call_cost
+        self.batch = batch
+        self._runner = None
+        self.port = None
+
+    def url(self, index: int) -> tuple:
+        return "127.0.0.1", self.port, f"/{index}/ubus"
+
+    def _handle_one(self, router: FakeRouter, request: dict) -> dict:
+        reply = {"jsonrpc": "2.0", "id": request.get("id")}
+        params = request.get("params", [])
+        router.calls += 1
+        if request.get("method") == "list":
+            reply["result"] = router.objects()
+            return reply
+        sid, obj, method = params[0], params[1], params[2]
+        args = params[3] if len(params) > 3 else {}
+        if not (obj == "session" and method == "login") and sid not in router.sessions:
+            reply["error"] = {"code": -32002, "message": "Access denied"}
+            return reply
+        try:
+            code, result = router.call(obj, method, args)
+        except KeyError:
+            reply["error"] = {"code": -32000, "message": "Object not found"}
+            return reply
+        reply["result"] = [code, result] if result is not None else [code]
+        return reply
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        router = self.routers[int(request.match_info["index"])]
+        router.requests += 1
+        body = json.loads(await request.read())
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if isinstance(body, list):
+            if not self.batch:
+                return web.json_response({"jsonrpc": "2.0", "id": None, "error": {"code": -32600, "message": "Invalid request"}})
+            if self.call_cost:
+                await asyncio.sleep(self.call_cost * len(body))
+            return web.json_response([self._handle_one(router, item) for item in body])
+        if self.call_cost:
+            await asyncio.sleep(self.call_cost)
+        return web.json_response(self._handle_one(router, body))
+
+    async def start(self, port: int = 0):
+        app = web.Application()
+        app.router.add_post("/{index}/ubus", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        await self._runner.cleanup()
+
+
+async def _serve(args):
+    routers = [
+        FakeRouter(i, args.aps, args.clients, args.mesh_group, args.wan, snapshot=args.snapshot)
+        for i in range(args.routers)
+    ]
+    server = FakeRpcd(routers, args.latency / 1000, args.call_cost / 1000, not args.no_batch)
+    await server.start(args.port)
+    print(f"Serving {len(routers)} routers at http://127.0.0.1:{server.port}/<index>/ubus")
+    await asyncio.Event().wait()
+
+
+def add_router_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--aps", type=int, default=2, help="AP interfaces per router")
+    parser.add_argument("--clients", type=int, default=10, help="clients per AP interface")
+    parser.add_argument("--mesh-group", type=int, default=4, help="routers per mesh (0 disables mesh)")
+    parser.add_argument("--wan", type=int, default=1, help="WAN devices per router")
+    parser.add_argument("--latency", type=float, default=20, help="round trip latency per request, ms")
+    parser.add_argument("--call-cost", type=float, default=2, help="rpcd processing time per call, ms")
+    parser.add_argument("--no-batch", action="store_true", help="reject JSON-RPC batch requests")
+    parser.add_argument("--snapshot", action="store_true", help="provide the hass.snapshot plugin")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--routers", type=int, default=1)
+    parser.add_argument("--port", type=int, default=0)
+    add_router_arguments(parser)
+    asyncio.run(_serve(parser.parse_args()))
@@ -1,9 +1,10 @@
 from __future__ import annotations
-from .constants import DOMAIN, PLATFORMS
+from .constants import DOMAIN, PLATFORMS, DEFAULT_SERVICE_CONCURRENCY, DEFAULT_SERVICE_TIMEOUT, DEFAULT_EXEC_OUTPUT, ENTITY_REMOVE_POLLS
 
-from homeassistant.core import HomeAssistant, SupportsResponse
+from homeassistant.core import HomeAssistant, ServiceCall, SupportsResponse, callback
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.helpers import service
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers import entity_registry as er, service
 from homeassistant.helpers.typing import ConfigType
 from homeassistant.helpers.update_coordinator import (
     CoordinatorEntity,
@@ -11,14 +12,21 @@ from homeassistant.helpers.update_coordinator import (
 import homeassistant.helpers.config_validation as cv
 
 import voluptuous as vol
+import asyncio
 import logging
+import time
 
-from .coordinator import new_coordinator
+from .coordinator import new_coordinator, catalog_store, session_store
+from .mesh import MeshRegistry
+from .clients import ClientIndex
+from .logs import configure_trace, DEFAULT_TRACE_SAMPLE, DEFAULT_TRACE_MAX_LENGTH
 
 _LOGGER = logging.getLogger(__name__)
 
 CONFIG_SCHEMA = vol.Schema({
     DOMAIN: vol.Schema({
+        vol.Optional("trace_sample", default=DEFAULT_TRACE_SAMPLE): vol.All(vol.Coerce(int), vol.Range(min=1)),
+        vol.Optional("trace_max_length", default=DEFAULT_TRACE_MAX_LENGTH): vol.All(vol.Coerce(int), vol.Range(min=0)),
     }),
 }, extra=vol.ALLOW_EXTRA)
 
@@ -26,12 +34,12 @@ CONFIG_SCHEMA = vol.Schema({
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
     data = entry.as_dict()['data']
 
-    device = new_coordinator(hass, data, hass.data[DOMAIN]['devices'])
+    device = new_coordinator(hass, data, hass.data[DOMAIN]['mesh'], hass.data[DOMAIN]['clients'], entry.entry_id)
 
     hass.data[DOMAIN]['devices'][entry.entry_id] = device # Backward compatibility
     entry.runtime_data = device # New style
 
-    await device.coordinator.async_config_entry_first_refresh()
+    await device.async_config_entry_first_refresh()
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
 
     return True
@@ -41,75 +49,189 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry):
     await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
 
     entry.runtime_data = None
-    hass.data[DOMAIN]['devices'].pop(entry.entry_id)
+    device = hass.data[DOMAIN]['devices'].pop(entry.entry_id)
+    await device.async_shutdown()
 
     return True
 
 
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry):
+    await catalog_store(hass, entry.entry_id).async_remove()
+    await session_store(hass, entry.entry_id).async_remove()
+
+
+async def async_run_on_devices(call: ServiceCall, devices: dict, action) -> dict:
+    """Run `action(device)` for every target in parallel.
+
+    Returns entry_id -> dict(result=..., elapsed=...) or dict(error=..., elapsed=...),
+    a slow or failing device never blocks or aborts the others.
+    """
+    semaphore = asyncio.Semaphore(max(1, int(call.data.get("parallel", DEFAULT_SERVICE_CONCURRENCY))))
+    timeout = call.data.get("timeout", DEFAULT_SERVICE_TIMEOUT)
+
+    async def run(entry_id, device):
+        async with semaphore:
+            started = time.monotonic()
+            try:
+                async with asyncio.timeout(timeout):
+                    result = dict(result=await action(device))
+            except Exception as err:
+                _LOGGER.warning(f"Service {call.service} failed on [{entry_id}]: {err!r}")
+                result = dict(error=str(err) or type(err).__name__)
+            result["elapsed"] = round(time.monotonic() - started, 3)
+            return entry_id, result
+
+    return dict(await asyncio.gather(*[run(entry_id, device) for entry_id, device in devices.items()]))
+
+
+def service_response(call: ServiceCall, ids, results: dict):
+    failed = {entry_id: item["error"] for entry_id, item in results.items() if "error" in item}
+    if len(ids) == 1:
+        item = results.get(list(ids)[0], {})
+        if "error" in item:
+            raise HomeAssistantError(item["error"])
+        return item.get("result")
+    if failed and not call.return_response:
+        raise HomeAssistantError(f"{call.service} failed on {len(failed)} of {len(results)} devices: {failed}")
+    return results
+
+
 async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
-    hass.data[DOMAIN] = dict(devices={})
+    hass.data[DOMAIN] = dict(devices={}, mesh=MeshRegistry(), clients=ClientIndex())
+    if DOMAIN in config:
+        configure_trace(config[DOMAIN]["trace_sample"], config[DOMAIN]["trace_max_length"])
+
+    async def async_target_devices(call, api: str = None) -> tuple:
+        ids = await service.async_extract_config_entry_ids(hass, call)
+        devices = {}
+        for entry_id in ids:
+            if device := hass.data[DOMAIN]["devices"].get(entry_id):
+                if api is None or device.is_api_supported(api):
+                    devices[entry_id] = device
+        return ids, devices
 
     async def async_reboot(call):
-        for entry_id in await service.async_extract_config_entry_ids(hass, call):
-            await hass.data[DOMAIN]["devices"][entry_id].do_reboot()
+        ids, devices = await async_target_devices(call)
+        results = await async_run_on_devices(call, devices, lambda device: device.do_reboot())
+        service_response(call, ids, results)
 
     async def async_exec(call):
         parts = call.data["command"].split(" ")
-        ids = await service.async_extract_config_entry_ids(hass, call)
-        response = {}
-        for entry_id in ids:
-            if coordinator := hass.data[DOMAIN]["devices"].get(entry_id): 
-                if coordinator.is_api_supported("file"):
-                    args = parts[1:]
-                    if "arguments" in call.data:
-                        args = call.data["arguments"].strip().split("\n")
-                    response[entry_id] = await coordinator.do_file_exec(
-                        parts[0],
-                        args,
-                        call.data.get("environment", {}),
-                        call.data.get("extra", {})
-                    )
-        if len(ids) == 1:
-            return response.get(list(ids)[0])
-        return response
+        args = parts[1:]
+        if "arguments" in call.data:
+            args = call.data["arguments"].strip().split("\n")
+        ids, devices = await async_target_devices(call, "file")
+        results = await async_run_on_devices(call, devices, lambda device: device.do_file_exec(
+            parts[0],
+            args,
+            call.data.get("environment", {}),
+            call.data.get("extra", {}),
+            int(call.data.get("max_output", DEFAULT_EXEC_OUTPUT)),
+            call.data.get("parse", "auto"),
+            call.data.get("output_file", False),
+        ))
+        response = service_response(call, ids, results)
+        return response if call.return_response else None
 
     async def async_init(call):
         parts = call.data["name"].split(" ")
-        for entry_id in await service.async_extract_config_entry_ids(hass, call):
-            device = hass.data[DOMAIN]["devices"][entry_id]
-            if device.is_api_supported("rc"):
-                await device.do_rc_init(
-                    parts[0],
-                    call.data.get("action", {})
-                )
+        ids, devices = await async_target_devices(call, "rc")
+        results = await async_run_on_devices(call, devices, lambda device: device.do_rc_init(
+            parts[0],
+            call.data.get("action", {})
+        ))
+        service_response(call, ids, results)
 
     async def async_ubus(call):
-        response = {}
-        ids = await service.async_extract_config_entry_ids(hass, call)
-        for entry_id in ids:
-            if coordinator := hass.data[DOMAIN]["devices"].get(entry_id):
-                response[entry_id] = await coordinator.do_ubus_call(
-                    call.data.get("subsystem"),
-                    call.data.get("method"),
-                    call.data.get("parameters", {}),
-                )
-        if len(ids) == 1:
-            return response.get(list(ids)[0])
-        return response
+        ids, devices = await async_target_devices(call)
+        results = await async_run_on_devices(call, devices, lambda device: device.do_ubus_call(
+            call.data.get("subsystem"),
+            call.data.get("method"),
+            call.data.get("parameters", {}),
+            call.data.get("cache_ttl", 0),
+        ))
+        return service_response(call, ids, results)
+
+    async def async_install_plugin(call):
+        ids, devices = await async_target_devices(call, "file")
+        results = await async_run_on_devices(call, devices, lambda device: device.do_install_plugin())
+        response = service_response(call, ids, results)
+        return response if call.return_response else None
 
     hass.services.async_register(DOMAIN, "reboot", async_reboot)
     hass.services.async_register(DOMAIN, "exec", async_exec, supports_response=SupportsResponse.OPTIONAL)
     hass.services.async_register(DOMAIN, "init", async_init)
     hass.services.async_register(DOMAIN, "ubus", async_ubus, supports_response=SupportsResponse.ONLY)
+    hass.services.async_register(DOMAIN, "install_plugin", async_install_plugin, supports_response=SupportsResponse.OPTIONAL)
 
     return True
 
 
+@callback
+def async_track_entities(hass: HomeAssistant, entry: ConfigEntry, device, async_add_entities, keys, create):
+    """Keep platform entities in line with the items present in the fast state.
+
+    `keys(data)` lists the items that need entities, `create(key)` builds the
+    entities of a new item. Entities of items missing from
+    ENTITY_REMOVE_POLLS polls in a row are removed together with their
+    registry entries, a single failed call must not drop customizations.
+    """
+    known = {}
+    missing = {}
+    last = [None]
+
+    @callback
+    def sync():
+        data = device.coordinator.data
+        if not device.coordinator.last_update_success or data is None or data is last[0]:
+            # Push updates change the state in place, only new polls count
+            return
+        last[0] = data
+        current = set(keys(data))
+        added = []
+        for key in current - known.keys():
+            known[key] = create(key)
+            added.extend(known[key])
+        for key in current & missing.keys():
+            del missing[key]
+        registry = er.async_get(hass)
+        for key in known.keys() - current:
+            missing[key] = missing.get(key, 0) + 1
+            if missing[key] < ENTITY_REMOVE_POLLS:
+                continue
+            del missing[key]
+            for entity in known.pop(key):
+                _LOGGER.debug("Device [%s] removing %s, %s is gone", device.id, entity.entity_id, key)
+                if entity.registry_entry:
+                    registry.async_remove(entity.entity_id)
+                else:
+                    hass.async_create_task(entity.async_remove(force_remove=True))
+        if added:
+            async_add_entities(added)
+
+    sync()
+    entry.async_on_unload(device.coordinator.async_add_listener(sync))
+
+
 class OpenWrtEntity(CoordinatorEntity):
     def __init__(self, device, device_id: str):
         super().__init__(device.coordinator)
         self._device_id = device_id
         self._device = device
+        # Parts of the device state the entity reads, see diff_state(); empty means all of it
+        self._inputs = ()
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        if self._device.has_changed(self._inputs):
+            super()._handle_coordinator_update()
+
+    @property
+    def available(self) -> bool:
+        # The item can be missing for a few polls before the entity is removed
+        return super().available and all(
+            item[1] in getattr(self.data, item[0]) for item in self._inputs if isinstance(item, tuple)
+        )
 
     @property
     def device_info(self):
@@ -118,9 +240,9 @@ class OpenWrtEntity(CoordinatorEntity):
                 ("id", self._device_id)
             },
             "name": f"OpenWrt [{self._device_id}]",
-            "model": self.data["info"]["model"],
-            "manufacturer": self.data["info"]["manufacturer"],
-            "sw_version": self.data["info"]["sw_version"],
+            "model": self._device.info["model"],
+            "manufacturer": self._device.info["manufacturer"],
+            "sw_version": self._device.info["sw_version"],
         }
 
     @property
@@ -4,7 +4,7 @@ from homeassistant.core import HomeAssistant
 
 import logging
 
-from . import OpenWrtEntity
+from . import OpenWrtEntity, async_track_entities
 from .constants import DOMAIN
 
 _LOGGER = logging.getLogger(__name__)
@@ -16,19 +16,18 @@ async def async_setup_entry(
     async_add_entities
 ) -> None:
 
-    entities = []
     data = entry.as_dict()
     device = hass.data[DOMAIN]['devices'][entry.entry_id]
     device_id = data['data']['id']
 
     # This one will be always here
-    entities.append(OpenWrtSensor(device, device_id))
+    async_add_entities([OpenWrtSensor(device, device_id)])
 
-    for net_id in device.coordinator.data["mwan3"]:
-        entities.append(
-            Mwan3OnlineBinarySensor(device, device_id, net_id)
-        )
-    async_add_entities(entities)
+    async_track_entities(
+        hass, entry, device, async_add_entities,
+        lambda state: state.mwan3,
+        lambda net_id: [Mwan3OnlineBinarySensor(device, device_id, net_id)],
+    )
     return True
 
 
@@ -50,11 +49,12 @@ class Mwan3OnlineBinarySensor(OpenWrtEntity, BinarySensorEntity):
 
     def __init__(self, device, device_id: str, interface: str):
         super().__init__(device, device_id)
+        self._inputs = (("mwan3", interface),)
         self._interface_id = interface
 
     @property
     def available(self):
-        return self._interface_id in self.data["mwan3"]
+        return self._interface_id in self.data.mwan3
 
     @property
     def unique_id(self):
@@ -66,8 +66,8 @@ class Mwan3OnlineBinarySensor(OpenWrtEntity, BinarySensorEntity):
 
     @property
     def is_on(self):
-        data = self.data["mwan3"].get(self._interface_id, {})
-        return data.get("online", False)
+        iface = self.data.mwan3.get(self._interface_id)
+        return iface.online if iface else False
 
     @property
     def device_class(self):
@@ -0,0 +1,50 @@
+from collections import OrderedDict
+import json
+import time
+
+DEFAULT_CACHE_SIZE: int = 128
+
+
+class ResponseCache:
+    """LRU cache of ubus responses, freshness is decided by each reader."""
+
+    def __init__(self, max_entries: int = DEFAULT_CACHE_SIZE):
+        self._max_entries = max_entries
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(subsystem: str, method: str, params: dict) -> tuple:
+        return (subsystem, method, json.dumps(params, sort_keys=True))
+
+    def get(self, key: tuple, ttl: float):
+        entry = self._entries.get(key)
+        if entry is None or time.monotonic() - entry[0] > ttl:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key: tuple, value):
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self):
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return dict(
+            hits=self.hits,
+            misses=self.misses,
+            entries=len(self._entries),
+            hit_ratio=round(self.hits / total * 100, 1) if total else 0,
+        )
@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+import logging
+import time
+
+_LOGGER = logging.getLogger(__name__)
+
+# Smaller signal changes don't rewrite the tracker state
+SIGNAL_STEP: int = 5
+
+
+@dataclass(slots=True)
+class ClientLocation:
+    entry_id: str
+    router: str
+    ifname: str
+    signal: int | None
+    since: float
+    seen: float
+
+
+class ClientIndex:
+    """Wireless clients of all config entries: mac -> where it is associated.
+
+    Each device reports its hostapd clients after an update. A client seen
+    by several access points is located on the one it joined last, which
+    follows roaming before the old AP drops it. Every client is owned by
+    the first entry that saw it, that entry's device_tracker platform has
+    the entity.
+    """
+
+    def __init__(self):
+        self._claims = {}
+        self._entries = {}
+        self._last_seen = {}
+        self._owners = {}
+        self._listeners = {}
+
+    def location(self, mac: str) -> ClientLocation | None:
+        claims = self._claims.get(mac)
+        if not claims:
+            return None
+        return max(claims.values(), key=lambda claim: claim.since)
+
+    def last_seen(self, mac: str) -> float | None:
+        if location := self.location(mac):
+            return location.seen
+        return self._last_seen.get(mac)
+
+    def seen_by(self, entry_id: str) -> set:
+        return self._entries.get(entry_id, set())
+
+    def update(self, entry_id: str, router: str, wireless: dict):
+        now = time.time()
+        current = set()
+        changed = set()
+        for ifname, iface in wireless.items():
+            for mac, client in iface.macs.items():
+                current.add(mac)
+                claims = self._claims.setdefault(mac, {})
+                claim = claims.get(entry_id)
+                if claim is None or claim.ifname != ifname:
+                    claims[entry_id] = ClientLocation(entry_id, router, ifname, client.signal, now, now)
+                    changed.add(mac)
+                    continue
+                if _signal_moved(claim.signal, client.signal):
+                    changed.add(mac)
+                claim.signal = client.signal
+                claim.seen = now
+        for mac in self._entries.get(entry_id, set()) - current:
+            claims = self._claims.get(mac, {})
+            if (claim := claims.pop(entry_id, None)) is not None:
+                self._last_seen[mac] = claim.seen
+            if not claims:
+                self._claims.pop(mac, None)
+            changed.add(mac)
+        if current:
+            self._entries[entry_id] = current
+        else:
+            self._entries.pop(entry_id, None)
+        if changed:
+            self._notify(changed)
+
+    def adopt(self, entry_id: str, macs) -> list:
+        """Make `entry_id` the owner of the clients in `macs` nobody owns yet."""
+        adopted = [mac for mac in macs if mac not in self._owners]
+        for mac in adopted:
+            self._owners[mac] = entry_id
+        return adopted
+
+    def owner(self, mac: str) -> str | None:
+        return self._owners.get(mac)
+
+    def remove(self, entry_id: str):
+        self.update(entry_id, None, {})
+        self._listeners.pop(entry_id, None)
+        released = {mac for mac, owner in self._owners.items() if owner == entry_id}
+        for mac in released:
+            self._owners.pop(mac)
+        if released:
+            # Clients still seen elsewhere get an entity from another entry
+            self._notify(released)
+
+    def async_add_listener(self, entry_id: str, callback):
+        self._listeners[entry_id] = callback
+
+        def remove_listener():
+            if self._listeners.get(entry_id) is callback:
+                self._listeners.pop(entry_id)
+        return remove_listener
+
+    def _notify(self, macs: set):
+        _LOGGER.debug("Wireless clients changed: %d", len(macs))
+        for callback in list(self._listeners.values()):
+            callback(macs)
+
+
+def _signal_moved(before, after) -> bool:
+    if before is None or after is None:
+        return before != after
+    return abs(before - after) >= SIGNAL_STEP
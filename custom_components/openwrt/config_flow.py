@@ -2,6 +2,7 @@ from homeassistant import config_entries
 import homeassistant.helpers.config_validation as cv
 from .constants import DOMAIN
 from .coordinator import new_ubus_client
+from .logs import Payload
 
 import logging
 import voluptuous as vol
@@ -18,8 +19,14 @@ STEP_USER_DATA_SCHEMA = vol.Schema({
     vol.Optional('port', default=0): cv.positive_int,
     vol.Optional('path', default="/ubus"): cv.string,
     vol.Required('interval', default=30): cv.positive_int,
+    vol.Optional('discovery_interval', default=300): cv.positive_int,
+    vol.Optional('info_interval', default=3600): cv.positive_int,
+    vol.Optional('max_concurrency', default=2): vol.All(cv.positive_int, vol.Range(min=1)),
     vol.Required('wps', default=False): cv.boolean,
+    vol.Optional('push', default=False): cv.boolean,
+    vol.Optional('push_interval', default=300): cv.positive_int,
     vol.Optional('wan_devices'): cv.string,
+    vol.Optional('wan_discovery', default=False): cv.boolean,
     vol.Optional('wifi_devices'): cv.string,
     vol.Optional('mesh_devices'): cv.string,
 })
@@ -35,7 +42,7 @@ class OpenWrtConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             return self.async_show_form(
                 step_id="user", data_schema=STEP_USER_DATA_SCHEMA
             )
-        _LOGGER.debug(f"Input: {user_input}")
+        _LOGGER.debug("Input: %s", Payload(user_input))
         await self.async_set_unique_id(user_input["address"])
         self._abort_if_unique_id_configured()
         ubus = new_ubus_client(self.hass, user_input)
@@ -1,2 +1,6 @@
 DOMAIN = 'openwrt'
-PLATFORMS = ["sensor", "switch", "binary_sensor"]
\ No newline at end of file
+PLATFORMS = ["sensor", "switch", "binary_sensor", "device_tracker"]
+DEFAULT_SERVICE_CONCURRENCY = 10
+DEFAULT_SERVICE_TIMEOUT = 30
+DEFAULT_EXEC_OUTPUT = 65536
+ENTITY_REMOVE_POLLS = 3
@@ -1,138 +1,451 @@
 from unittest import result
 from homeassistant.exceptions import ConfigEntryAuthFailed
+from homeassistant.helpers import device_registry as dr
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from homeassistant.helpers.storage import Store
 from homeassistant.helpers.update_coordinator import (
     DataUpdateCoordinator,
     UpdateFailed,
 )
-from homeassistant.util.json import json_loads
-
-from .ubus import Ubus
-from .constants import DOMAIN
-
+from homeassistant.util import slugify
+
+from .ubus import Ubus, DEFAULT_MAX_CONCURRENCY
+from .scheduler import PRIORITY_INTERACTIVE, PRIORITY_SERVICE
+from .cache import ResponseCache
+from .push import HostapdPush, DEFAULT_PUSH_INTERVAL
+from .mesh import MeshRegistry
+from .clients import ClientIndex
+from .interval import AdaptiveInterval
+from .stats import LatencyWindow, RateWindow
+from .model import Client, DeviceState, MeshInterface, MeshPeer, Mwan3Interface, WanCounters, WirelessInterface, diff_state
+from .logs import Payload, trace
+from .constants import DOMAIN, DEFAULT_EXEC_OUTPUT
+from .output import parse_output, truncate_output, write_output
+
+import asyncio
+import json
 import logging
+import os
+import time
 from datetime import timedelta
 
 _LOGGER = logging.getLogger(__name__)
 
+DEFAULT_INTERVAL: int = 30
+DEFAULT_INFO_INTERVAL: int = 3600
+DEFAULT_DISCOVERY_INTERVAL: int = 300
+
+CATALOG_STORAGE_VERSION: int = 1
+SESSION_STORAGE_VERSION: int = 1
+CATALOG_REFRESH_INTERVAL: int = 6 * 3600
+CATALOG_RETRY_INTERVAL: int = 300
+
+# Optional rpcd plugin (rpcd/hass.uc) answering a whole fast poll in one call
+SNAPSHOT_OBJECT: str = "hass"
+SNAPSHOT_PLUGIN_PATH: str = "/usr/share/rpcd/ucode/hass.uc"
+SNAPSHOT_ACL_PATH: str = "/usr/share/rpcd/acl.d/hass-snapshot.json"
+SNAPSHOT_ACL_GROUP: str = "hass"
+RPCD_RESTART_DELAY: int = 5
+
+
+def catalog_store(hass, entry_id: str) -> Store:
+    return Store(hass, CATALOG_STORAGE_VERSION, f"{DOMAIN}.{entry_id}.catalog")
+
+
+def session_store(hass, entry_id: str) -> Store:
+    return Store(hass, SESSION_STORAGE_VERSION, f"{DOMAIN}.{entry_id}.session", private=True)
+
+
+def compact_catalog(apis: dict) -> dict:
+    """Reduce a `ubus list` dump to object name -> method names."""
+    return {name: frozenset(methods or {}) for name, methods in apis.items()}
+
+
+def _is_wan(iface: dict) -> bool:
+    """Whether a `network.interface dump` entry is an uplink: named wan or holding a default route."""
+    if iface.get("interface") in ("wan", "wan6"):
+        return True
+    return any(
+        route.get("mask") == 0 and route.get("target") in ("0.0.0.0", "::")
+        for route in iface.get("route", [])
+    )
+
+
+def snapshot_result(snapshot: dict, call: tuple):
+    """Answer a (subsystem, method, params) call from a `hass snapshot` response.
+
+    Returns the result the call would have had, or a NameError when the
+    snapshot doesn't hold it, like api_batch() does for a missing object.
+    """
+    subsystem, method, params = call
+    value = None
+    if subsystem == "system" and method == "info":
+        value = snapshot.get("info")
+    elif subsystem.startswith("hostapd."):
+        field = {"get_clients": "clients", "wps_status": "wps"}.get(method)
+        value = (snapshot.get("hostapd") or {}).get(subsystem[8:], {}).get(field)
+    elif subsystem == "iwinfo" and method in ("info", "assoclist"):
+        value = (snapshot.get("iwinfo") or {}).get(params.get("device"), {}).get(method)
+        if value is not None and "mac" in params:
+            value = next((
+                station for station in value.get("results", [])
+                if station.get("mac", "").lower() == params["mac"]
+            ), None)
+    elif subsystem == "mwan3" and method == "status":
+        value = snapshot.get("mwan3")
+    elif subsystem == "network.device" and method == "status" and not params:
+        value = snapshot.get("devices")
+    if value is None:
+        return NameError(f"{subsystem} / {method} is not in the snapshot")
+    return value
+
+
+def _unwrap(result) -> dict:
+    """Return a single api_batch() result, re-raising the error recorded for it."""
+    if isinstance(result, Exception):
+        raise result
+    return result
+
 
 class DeviceCoordinator:
 
-    def __init__(self, hass, config: dict, ubus: Ubus, all_devices: dict):
+    def __init__(self, hass, config: dict, ubus: Ubus, mesh: MeshRegistry, clients: ClientIndex, entry_id: str):
         self._config = config
         self._ubus = ubus
-        self._all_devices = all_devices
+        self._mesh = mesh
+        self._clients = clients
+        self._entry_id = entry_id
         self._id = config["id"]
         self._apis = None
+        self._catalog_store = catalog_store(hass, entry_id)
+        self._catalog_updated = 0
+        self._catalog_task = None
+        self._cache = ResponseCache()
         self._wps = config.get("wps", False)
-
+        self._wireless_config = None
+        self._assoclist_per_peer = set()
+        self._wan_rates = {}
+        self._uptime = None
+        self._snapshot_allowed = True
+        self._load_supported = True
+        self._changed = None
+        self._interval = timedelta(seconds=config.get("interval", DEFAULT_INTERVAL))
+        self._adaptive = AdaptiveInterval()
+        self._poll_latency = dict(info=LatencyWindow(), discovery=LatencyWindow(), fast=LatencyWindow())
+        self._push = HostapdPush(
+            self,
+            config.get("interval", DEFAULT_INTERVAL),
+            config.get("push_interval", DEFAULT_PUSH_INTERVAL),
+        ) if config.get("push", False) else None
+
+        # Board info is effectively static, wireless topology changes rarely,
+        # only the client/peer/WAN counters need the configured interval
+        self._info_coordinator = DataUpdateCoordinator(
+            hass,
+            _LOGGER,
+            name='openwrt_info',
+            update_method=self.make_async_update_data(self.async_update_info, 'info'),
+            update_interval=timedelta(seconds=config.get("info_interval", DEFAULT_INFO_INTERVAL))
+        )
+        self._discovery_coordinator = DataUpdateCoordinator(
+            hass,
+            _LOGGER,
+            name='openwrt_discovery',
+            update_method=self.make_async_update_data(self.async_update_discovery, 'discovery'),
+            update_interval=timedelta(seconds=config.get("discovery_interval", DEFAULT_DISCOVERY_INTERVAL))
+        )
         self._coordinator = DataUpdateCoordinator(
             hass,
             _LOGGER,
             name='openwrt',
-            update_method=self.make_async_update_data(),
-            update_interval=timedelta(seconds=config.get("interval", 30))
+            update_method=self.make_async_update_data(self.async_update_fast, 'fast'),
+            update_interval=timedelta(seconds=config.get("interval", DEFAULT_INTERVAL))
         )
+        self._unsubscribe = [
+            self._info_coordinator.async_add_listener(self._handle_info_update),
+            self._discovery_coordinator.async_add_listener(self._handle_discovery_update),
+            self._mesh.async_add_listener(entry_id, self._handle_mesh_update),
+        ]
 
     @property
     def coordinator(self) -> DataUpdateCoordinator:
         return self._coordinator
 
+    @property
+    def id(self) -> str:
+        return self._id
+
+    @property
+    def ubus(self) -> Ubus:
+        return self._ubus
+
+    @property
+    def info_coordinator(self) -> DataUpdateCoordinator:
+        return self._info_coordinator
+
+    @property
+    def discovery_coordinator(self) -> DataUpdateCoordinator:
+        return self._discovery_coordinator
+
+    @property
+    def cache_stats(self) -> dict:
+        return self._cache.stats
+
+    @property
+    def info(self) -> dict:
+        return self._info_coordinator.data
+
+    async def async_config_entry_first_refresh(self):
+        await self._ubus.async_restore_session()
+        await self._info_coordinator.async_config_entry_first_refresh()
+        await self._discovery_coordinator.async_config_entry_first_refresh()
+        await self._coordinator.async_config_entry_first_refresh()
+
+    async def async_shutdown(self):
+        if self._push:
+            self._push.stop()
+        if self._catalog_task and not self._catalog_task.done():
+            self._catalog_task.cancel()
+        for unsubscribe in self._unsubscribe:
+            unsubscribe()
+        self._unsubscribe = []
+        self._mesh.remove(self._entry_id)
+        self._clients.remove(self._entry_id)
+        for coordinator in (self._coordinator, self._discovery_coordinator, self._info_coordinator):
+            await coordinator.async_shutdown()
+
+    def _handle_info_update(self):
+        if not self._info_coordinator.last_update_success:
+            return
+        registry = dr.async_get(self._coordinator.hass)
+        if device := registry.async_get_device(identifiers={("id", self._id)}):
+            registry.async_update_device(device.id, **self.info)
+
+    def _handle_discovery_update(self):
+        wireless_config = self._discovery_coordinator.data
+        if wireless_config == self._wireless_config:
+            return
+        first = self._wireless_config is None
+        self._wireless_config = wireless_config
+        if self._push:
+            self._push.sync([
+                conf['ifname'] for conf in wireless_config['ap']
+                if self.is_api_supported(f"hostapd.{conf['ifname']}")
+            ])
+        if not first:
+            self._coordinator.hass.async_create_task(self._coordinator.async_request_refresh())
+
+    def _handle_mesh_update(self, mesh_ids: set):
+        data = self._coordinator.data
+        if not data or not data.mesh:
+            return
+        if any(info.mesh_id in mesh_ids for info in data.mesh.values()):
+            self._coordinator.hass.async_create_task(self._coordinator.async_request_refresh())
+
+    def has_changed(self, inputs) -> bool:
+        """Whether any of `inputs` (see diff_state()) changed in the last update.
+
+        Entities without inputs and any update after a failure always count as changed.
+        """
+        if self._changed is None or not inputs or not self._coordinator.last_update_success:
+            return True
+        return any(item in self._changed for item in inputs)
+
+    def set_updated_data(self, changed: set):
+        """Publish an in-place change of the fast coordinator data.
+
+        Only the listeners are notified, async_set_updated_data() would
+        reschedule the next poll and frequent events could hold it off forever.
+        """
+        self._changed = changed
+        self._clients.update(self._entry_id, self._id, self._coordinator.data.wireless)
+        self._coordinator.async_update_listeners()
+
+    @property
+    def poll_stats(self) -> dict:
+        return dict(
+            poll_interval=self._coordinator.update_interval.total_seconds(),
+            poll_duration=round(self._adaptive.duration, 3) if self._adaptive.duration is not None else None,
+            consecutive_failures=self._adaptive.failures,
+            load=self._adaptive.load,
+        )
+
+    @property
+    def ubus_stats(self) -> dict:
+        return self._ubus.stats.summary
+
+    @property
+    def poll_latency(self) -> dict:
+        return {tier: window.summary for tier, window in self._poll_latency.items()}
+
+    @property
+    def diagnostics(self) -> dict:
+        return dict(
+            ubus=self._ubus.stats.details,
+            batch_supported=self._ubus.batch_supported,
+            polls=self.poll_latency,
+            poll=self.poll_stats,
+            cache=self.cache_stats,
+            catalog_objects=len(self._apis or {}),
+            push_connected=self._push.connected if self._push else None,
+            snapshot=self.snapshot_supported,
+            scheduler=self._ubus.scheduler.stats,
+        )
+
+    def update_poll_interval(self):
+        base = self._push.poll_interval if self._push else self._interval
+        self._coordinator.update_interval = self._adaptive.interval(base)
+
     def _configured_devices(self, config_name):
         value = self._config.get(config_name, "")
         if value == "":
             return []
         return list([x.strip() for x in value.split(",")])
 
-    async def discover_wireless(self) -> dict:
-        result = dict(ap=[], mesh=[])
+    async def _run_batch(self, *sections, snapshot: dict = None) -> list:
+        """Send the calls of all sections in one batch request.
+
+        Every section is a `(calls, parse)` pair, `parse` receives the slice of
+        results matching its own calls. With a `snapshot` the calls are
+        answered from it and nothing is sent.
+        """
+        calls = [call for section_calls, _ in sections for call in section_calls]
+        if snapshot is not None:
+            results = [snapshot_result(snapshot, call) for call in calls]
+        else:
+            results = await self._ubus.api_batch(calls)
+        if any(isinstance(item, NameError) for item in results):
+            # An object went away (or was restarted), check what is there now
+            self._retry_catalog_refresh()
+        output = []
+        pos = 0
+        for section_calls, parse in sections:
+            output.append(parse(results[pos:pos + len(section_calls)]))
+            pos += len(section_calls)
+        return output
+
+    def discover_wireless(self):
         if not self.is_api_supported("network.wireless"):
-            return result
+            return [], lambda _: dict(ap=[], mesh=[])
         wifi_devices = self._configured_devices("wifi_devices")
-        try:
-            response = await self._ubus.api_call('network.wireless', 'status', {})
-            _LOGGER.debug(f"Wireless status response: {response}")
-            for radio, item in response.items():
-                if item.get('disabled', False):
-                    continue
-                for iface in item['interfaces']:
-                    if 'ifname' not in iface:
+
+        def parse(results) -> dict:
+            result = dict(ap=[], mesh=[])
+            try:
+                response = _unwrap(results[0])
+                trace("Wireless status response [%s]: %s", self._id, response)
+                for radio, item in response.items():
+                    if item.get('disabled', False):
                         continue
-                    conf = dict(ifname=iface['ifname'],
-                                network=iface['config']['network'][0])
-                    if iface['config']['mode'] == 'ap':
-                        if len(wifi_devices) and iface['ifname'] not in wifi_devices:
+                    for iface in item['interfaces']:
+                        if 'ifname' not in iface:
                             continue
-                        result['ap'].append(conf)
-                    if iface['config']['mode'] == 'mesh':
-                        conf['mesh_id'] = iface['config']['mesh_id']
-                        result['mesh'].append(conf)
-        except NameError as err:
-            _LOGGER.warning(f"Device [{self._id}] doesn't support wireless: {err}")
-        return result
+                        conf = dict(ifname=iface['ifname'],
+                                    network=iface['config']['network'][0])
+                        if iface['config']['mode'] == 'ap':
+                            if len(wifi_devices) and iface['ifname'] not in wifi_devices:
+                                continue
+                            result['ap'].append(conf)
+                        if iface['config']['mode'] == 'mesh':
+                            conf['mesh_id'] = iface['config']['mesh_id']
+                            result['mesh'].append(conf)
+            except NameError as err:
+                _LOGGER.warning(f"Device [{self._id}] doesn't support wireless: {err}")
+            return result
+        return [('network.wireless', 'status', {})], parse
 
-    def find_mesh_peers(self, mesh_id: str):
-        result = []
-        for _, device in self._all_devices.items():
-            data = device.coordinator.data
-            if not data or 'mesh' not in data or not data['mesh']:
-                _LOGGER.warning(f"Missing or invalid 'mesh' data for device: {device}")
-                continue
-            for _, mesh in data['mesh'].items():
-                if mesh['id'] == mesh_id:
-                    result.append(mesh['mac'])
-        return result
+    def find_mesh_peers(self, mesh_id: str, own_mac: str = None):
+        return [mac for mac in self._mesh.peers(mesh_id) if mac != own_mac]
 
-    async def update_mesh(self, configs) -> dict:
+    def update_mesh(self, configs):
         mesh_devices = self._configured_devices("mesh_devices")
-        result = dict()
         if not self.is_api_supported("iwinfo"):
+            return [], lambda _: dict()
+        configs = [
+            conf for conf in configs
+            if not len(mesh_devices) or conf['ifname'] in mesh_devices
+        ]
+
+        def parse(results) -> dict:
+            result = dict()
+            for conf, info in zip(configs, results):
+                try:
+                    info = _unwrap(info)
+                    result[conf['ifname']] = MeshInterface(
+                        mac=info['bssid'].lower(),
+                        mesh_id=conf['mesh_id'],
+                        signal=info.get("signal", -100),
+                        noise=info.get("noise", 0),
+                        bitrate=info.get("bitrate", -1),
+                    )
+                except (ConnectionError, NameError, KeyError) as err:
+                    _LOGGER.warning(f"Device [{self._id}] doesn't support iwinfo: {err}")
             return result
-        try:
-            for conf in configs:
-                if len(mesh_devices) and conf['ifname'] not in mesh_devices:
+        return [('iwinfo', 'info', dict(device=conf['ifname'])) for conf in configs], parse
+
+    def _mesh_peer(self, assoc: dict) -> MeshPeer:
+        return MeshPeer(
+            active=assoc.get("mesh plink") == "ESTAB",
+            signal=assoc.get("signal", -100),
+            noise=assoc.get("noise", 0)
+        )
+
+    def update_mesh_peers(self, mesh: dict):
+        """Fill `peers` of mesh interfaces from a single assoclist per interface.
+
+        The parser returns the interfaces whose firmware only answers
+        per-peer lookups, they are handled by update_mesh_peers_each().
+        """
+        targets = []
+        for ifname, info in mesh.items():
+            if ifname in self._assoclist_per_peer:
+                continue
+            peers = self.find_mesh_peers(info.mesh_id, info.mac)
+            if peers:
+                targets.append((ifname, peers))
+
+        def parse(results) -> list:
+            fallback = []
+            for (ifname, peers), response in zip(targets, results):
+                try:
+                    stations = _unwrap(response).get("results")
+                except (ConnectionError, NameError) as err:
+                    # Likely transient (the interface is being reconfigured), retry next poll
+                    _LOGGER.warning(f"Failed to get assoclist on device {ifname}: {err}")
                     continue
-                info = await self._ubus.api_call(
-                    'iwinfo',
-                    'info',
-                    dict(device=conf['ifname'])
-                )
-                peers = {}
-                result[conf['ifname']] = dict(
-                    mac=info['bssid'].lower(),
-                    signal=info.get("signal", -100),
-                    id=conf['mesh_id'],
-                    noise=info.get("noise", 0),
-                    bitrate=info.get("bitrate", -1),
-                    peers=peers,
-                )
-                for mac in self.find_mesh_peers(conf['mesh_id']):
-                    try:
-                        assoc = await self._ubus.api_call(
-                            'iwinfo',
-                            'assoclist',
-                            dict(device=conf['ifname'], mac=mac)
-                        )
-                        peers[mac] = dict(
-                            active=assoc.get("mesh plink") == "ESTAB",
-                            signal=assoc.get("signal", -100),
-                            noise=assoc.get("noise", 0)
-                        )
-                    except ConnectionError:
-                        _LOGGER.warning(f"Failed to get assoclist for {mac} on device {conf['ifname']}")
-                        pass
-        except ConnectionError as err:
-            _LOGGER.warning(f"Device [{self._id}] doesn't support iwinfo: {err}")
-        return result
+                if not isinstance(stations, list):
+                    _LOGGER.info(f"Device [{self._id}] {ifname} needs per-peer assoclist calls")
+                    self._assoclist_per_peer.add(ifname)
+                    fallback.append(ifname)
+                    continue
+                by_mac = {station.get("mac", "").lower(): station for station in stations}
+                for mac in peers:
+                    if (assoc := by_mac.get(mac)) is not None:
+                        mesh[ifname].set_peer(mac, self._mesh_peer(assoc))
+            return fallback
+        return [('iwinfo', 'assoclist', dict(device=ifname)) for ifname, _ in targets], parse
+
+    def update_mesh_peers_each(self, mesh: dict, interfaces):
+        """Fill `peers` with one assoclist call per peer, for older rpcd-mod-iwinfo."""
+        targets = []
+        for ifname in interfaces:
+            if info := mesh.get(ifname):
+                for mac in self.find_mesh_peers(info.mesh_id, info.mac):
+                    targets.append((ifname, mac))
+
+        def parse(results) -> dict:
+            for (ifname, mac), assoc in zip(targets, results):
+                try:
+                    mesh[ifname].set_peer(mac, self._mesh_peer(_unwrap(assoc)))
+                except (ConnectionError, NameError):
+                    _LOGGER.warning(f"Failed to get assoclist for {mac} on device {ifname}")
+            return mesh
+        return [('iwinfo', 'assoclist', dict(device=ifname, mac=mac)) for ifname, mac in targets], parse
 
-    async def update_hostapd_clients(self, interface_id: str) -> dict:
+    def update_hostapd_clients(self, interface_id: str, response, wps_response=None) -> WirelessInterface:
         try:
-            _LOGGER.debug(f"Updating hostapd clients for interface: {interface_id}")
-            response = await self._ubus.api_call(
-                f"hostapd.{interface_id}",
-                'get_clients',
-                dict()
-            )
-            _LOGGER.debug(f"Hostapd clients response for {interface_id}: {response}")
+            response = _unwrap(response)
+            trace("Hostapd clients response for %s: %s", interface_id, response)
 
             if 'clients' in response:
                 clients = response['clients']
@@ -140,36 +453,28 @@ class DeviceCoordinator:
                 _LOGGER.warning(f"'clients' key not found in response for interface {interface_id}. Response: {response}")
                 clients = {}
 
-            macs = dict()
-            for key, value in clients.items():
-                macs[key] = dict(signal=value.get("signal"))
-
-            result = dict(
-                clients=len(macs),
-                macs=macs,
-            )
+            result = WirelessInterface(macs={
+                key: Client(signal=value.get("signal")) for key, value in clients.items()
+            })
 
             if self._wps:
                 try:
-                    response = await self._ubus.api_call(
-                        f"hostapd.{interface_id}",
-                        'wps_status',
-                        dict()
-                    )
-                    result["wps"] = response.get("pbc_status") == "Active"
-                except ConnectionError:
+                    response = _unwrap(wps_response)
+                    result.wps = response.get("pbc_status") == "Active"
+                except (ConnectionError, NameError) as err:
                     _LOGGER.warning(f"Interface [{interface_id}] doesn't support WPS: {err}")
 
             return result
 
         except NameError as e:
             _LOGGER.warning(f"Could not find object for interface {interface_id}: {e}")
-            return {}
+            return WirelessInterface()
         except Exception as e:
             _LOGGER.error(f"Error while updating hostapd clients for {interface_id}: {e}")
-            return {}
+            return WirelessInterface()
 
     async def set_wps(self, interface_id: str, enable: bool):
+        self._cache.invalidate()
         await self._ubus.api_call(
             f"hostapd.{interface_id}",
             "wps_start" if enable else "wps_cancel",
@@ -178,61 +483,85 @@ class DeviceCoordinator:
         await self.coordinator.async_request_refresh()
 
     async def do_reboot(self):
-        _LOGGER.debug(f"Rebooting device: {self._id}")
+        _LOGGER.debug("Rebooting device: %s", self._id)
+        self._cache.invalidate()
         await self._ubus.api_call(
             "system",
             "reboot",
             dict()
         )
 
-    async def do_file_exec(self, command: str, params, env: dict, extra: dict):
-        _LOGGER.debug(f"Executing command: {self._id}: {command} with {params} env={env}")
+    async def do_file_exec(
+        self,
+        command: str,
+        params,
+        env: dict,
+        extra: dict,
+        max_output: int = DEFAULT_EXEC_OUTPUT,
+        parse: str = "auto",
+        output_file: bool = False,
+    ):
+        _LOGGER.debug("Executing command: %s: %s with %s env=%s", self._id, command, params, Payload(env))
+        self._cache.invalidate()
         result = await self._ubus.api_call(
             "file",
             "exec",
             dict(command=command, params=params, env=env) if len(env) else dict(command=command, params=params)
         )
-        _LOGGER.debug(f"Execute result: {self._id}: {result}")
-        self._coordinator.hass.bus.async_fire(
+        trace("Execute result: %s: %s", self._id, result)
+        hass = self._coordinator.hass
+        texts = {}
+        files = {}
+        for stream in ("stdout", "stderr"):
+            # Only the bounded copy is kept, the full text goes to a file if asked for
+            data = result.pop(stream, "")
+            if output_file and max_output and len(data) > max_output:
+                path = hass.config.path(DOMAIN, "exec", f"{slugify(self._id)}-{int(time.time() * 1000)}-{stream}.txt")
+                files[stream] = dict(file=await hass.async_add_executor_job(write_output, path, data), size=len(data))
+            texts[stream] = truncate_output(data, max_output)
+            del data
+        hass.bus.async_fire(
             "openwrt_exec_result",
             {
                 "address": self._config.get("address"),
                 "id": self._config.get("id"),
                 "command": command,
                 "code": result.get("code", 1),
-                "stdout": result.get("stdout", ""),
+                "stdout": texts["stdout"],
+                **({"stdout_file": files["stdout"]["file"]} if "stdout" in files else {}),
                 **extra,
             },
         )
-
-        def process_output(data: str):
-            try:
-                json = json_loads(data)
-                if isinstance(json, (list, dict)):
-                    return json
-            except Exception as e:
-                _LOGGER.debug(f"Failed to parse JSON output: {e}")
-                pass
-            return data.strip().split("\n")
-
         return {
             "code": result.get("code", 1),
-            "stdout": process_output(result.get("stdout", "")),
-            "stderr": process_output(result.get("stderr", "")),
+            **{
+                stream: files[stream] if stream in files else parse_output(text, parse)
+                for stream, text in texts.items()
+            },
         }
 
-    async def do_ubus_call(self, subsystem: str, method: str, params: dict):
-        _LOGGER.debug(f"do_ubus_call(): {subsystem} / {method}: {params}")
-        return await self._ubus.api_call(subsystem, method, params)
+    async def do_ubus_call(self, subsystem: str, method: str, params: dict, cache_ttl: float = 0):
+        _LOGGER.debug("do_ubus_call(): %s / %s: %s", subsystem, method, Payload(params))
+        if not self._ubus.is_read_only(subsystem, method):
+            # Anything may change after a write, cached reads are no longer trusted
+            self._cache.invalidate()
+            return await self._ubus.api_call(subsystem, method, params)
+        key = ResponseCache.key(subsystem, method, params)
+        if cache_ttl > 0 and (cached := self._cache.get(key, cache_ttl)) is not None:
+            return cached
+        result = await self._ubus.api_call(subsystem, method, params, priority=PRIORITY_SERVICE)
+        self._cache.put(key, result)
+        return result
 
     async def do_rc_init(self, name: str, action: str):
-        _LOGGER.debug(f"Executing name: {self._id}: {name} with {action}")
+        _LOGGER.debug("Executing name: %s: %s with %s", self._id, name, action)
+        self._cache.invalidate()
         result = await self._ubus.api_call(
             "rc",
             "init",
             dict(name=name, action=action)
         )
-        _LOGGER.debug(f"Execute result: {self._id}: {result}")
+        trace("Execute result: %s: %s", self._id, result)
         self._coordinator.hass.bus.async_fire(
             "openwrt_init_result",
             {
@@ -244,119 +573,351 @@ class DeviceCoordinator:
             },
         )
 
-    async def update_ap(self, configs) -> dict:
-        result = dict()
+    def update_ap(self, configs):
+        interfaces = []
         for item in configs:
             if 'ifname' in item:
-                ifname = item['ifname']
-                try:
-                    _LOGGER.debug(f"Updating AP for interface: {ifname}")
-                    result[ifname] = await self.update_hostapd_clients(ifname)
-                except Exception as e:
-                    _LOGGER.error(f"Error updating AP for {ifname}: {e}")
-                    continue  # Continue with the next item
+                interfaces.append(item['ifname'])
             else:
                 _LOGGER.warning(f"Missing 'ifname' in AP config: {item}")
-        return result
+        calls = []
+        for ifname in interfaces:
+            calls.append((f"hostapd.{ifname}", 'get_clients', dict()))
+            if self._wps:
+                calls.append((f"hostapd.{ifname}", 'wps_status', dict()))
+        step = 2 if self._wps else 1
 
-    async def update_info(self) -> dict:
-        result = dict()
-        response = await self._ubus.api_call("system", "board", {})
-        return {
-            "model": response["model"],
-            "manufacturer": response["release"]["distribution"],
-            "sw_version": "%s %s" % (
-                response["release"]["version"],
-                response["release"]["revision"]
-            ),
-        }
+        def parse(results) -> dict:
+            result = dict()
+            for idx, ifname in enumerate(interfaces):
+                result[ifname] = self.update_hostapd_clients(ifname, *results[idx * step:(idx + 1) * step])
+            return result
+        return calls, parse
+
+    def update_info(self):
+        def parse(results) -> dict:
+            response = _unwrap(results[0])
+            return {
+                "model": response["model"],
+                "manufacturer": response["release"]["distribution"],
+                "sw_version": "%s %s" % (
+                    response["release"]["version"],
+                    response["release"]["revision"]
+                ),
+            }
+        return [("system", "board", {})], parse
 
-    async def discover_mwan3(self):
+    def discover_mwan3(self):
         if not self.is_api_supported("mwan3"):
-            return dict()
+            return [], lambda _: dict()
+
+        def parse(results) -> dict:
+            result = dict()
+            try:
+                response = _unwrap(results[0])
+            except NameError as err:
+                # mwan3 stopped (or left the snapshot), the catalog refresh catches up
+                _LOGGER.warning(f"Device [{self._id}] mwan3 is not available: {err}")
+                return result
+            for key, iface in response.get("interfaces", {}).items():
+                if not iface.get("enabled", False):
+                    continue
+                result[key] = Mwan3Interface(
+                    offline_sec=iface.get("offline", 0),
+                    online_sec=iface.get("online", 0),
+                    uptime_sec=iface.get("uptime", 0),
+                    online=iface.get("status") == "online",
+                    status=iface.get("status"),
+                    up=iface.get("up"),
+                )
+            return result
+        return [("mwan3", "status", dict(section="interfaces"))], parse
+
+    def discover_wan(self):
+        if not self._config.get("wan_discovery", False) or not self.is_api_supported("network.interface", "dump"):
+            return [], lambda _: []
+
+        def parse(results) -> list:
+            devices = []
+            try:
+                response = _unwrap(results[0])
+            except (PermissionError, ConnectionError, NameError) as err:
+                _LOGGER.warning(f"Device [{self._id}] can't list network interfaces: {err}")
+                return devices
+            for iface in response.get("interface", []):
+                device = iface.get("l3_device") or iface.get("device")
+                if device and device not in devices and _is_wan(iface):
+                    devices.append(device)
+            return devices
+        return [("network.interface", "dump", {})], parse
+
+    def _wan_devices(self) -> list:
+        devices = self._configured_devices("wan_devices")
+        discovered = self._discovery_coordinator.data.get("wan", []) if self._discovery_coordinator.data else []
+        return devices + [device for device in discovered if device not in devices]
+
+    def update_wan_info(self):
+        devices = self._wan_devices()
+        if not devices:
+            return [], lambda _: dict()
+
+        def parse(results) -> dict:
+            result = dict()
+            now = time.monotonic()
+            table = _unwrap(results[0])
+            # Counters restart with the router, a wrap can't be told apart from the value
+            uptime = results[1].get("uptime") if len(results) > 1 and isinstance(results[1], dict) else None
+            rebooted = uptime is not None and self._uptime is not None and uptime < self._uptime
+            if uptime is not None:
+                self._uptime = uptime
+            for device_id in devices:
+                response = table.get(device_id)
+                if response is None:
+                    # Not there right now (pppoe-wan while the link is down)
+                    result[device_id] = WanCounters()
+                    continue
+                stats = response.get("statistics", {})
+                trace("WAN [%s]: %s", device_id, response)
+                rx_bytes = stats.get("rx_bytes", 0)
+                tx_bytes = stats.get("tx_bytes", 0)
+                rates = self._wan_rates.setdefault(device_id, RateWindow())
+                rates.add(now, rx_bytes, tx_bytes, rebooted)
+                (rx_rate, tx_rate), (rx_rate_avg, tx_rate_avg) = rates.instant, rates.average
+                result[device_id] = WanCounters(
+                    up=response.get("up", False),
+                    rx_bytes=rx_bytes,
+                    tx_bytes=tx_bytes,
+                    speed=response.get("speed"),
+                    mac=response.get("macaddr"),
+                    rx_rate=rx_rate,
+                    tx_rate=tx_rate,
+                    rx_rate_avg=rx_rate_avg,
+                    tx_rate_avg=tx_rate_avg,
+                )
+            for device_id in self._wan_rates.keys() - set(devices):
+                self._wan_rates.pop(device_id)
+            return result
+        # Without a name the status of every device comes in one response. The
+        # uptime comes from the system info call update_load() makes, unless the
+        # ACL denies it; reboots are then guessed from the counter values
+        calls = [("network.device", "status", {})]
+        if self._load_supported:
+            calls.append(("system", "info", {}))
+        return calls, parse
+
+    def update_load(self):
+        if not self._load_supported:
+            return [], lambda _: None
+
+        def parse(results):
+            try:
+                return _unwrap(results[0])["load"][0] / 65536
+            except (PermissionError, ConnectionError, NameError, KeyError, IndexError) as err:
+                _LOGGER.info(f"Device [{self._id}] doesn't report system load: {err}")
+                self._load_supported = False
+                return None
+        return [("system", "info", {})], parse
+
+    async def update_system(self, snapshot: dict = None) -> dict:
         result = dict()
-        response = await self._ubus.api_call(
-            "mwan3",
-            "status",
-            dict(section="interfaces")
+        result["mwan3"], result["wan"], result["load"] = await self._run_batch(
+            self.discover_mwan3(),
+            self.update_wan_info(),
+            self.update_load(),
+            snapshot=snapshot,
         )
-        for key, iface in response.get("interfaces", {}).items():
-            if not iface.get("enabled", False):
-                continue
-            result[key] = {
-                "offline_sec": iface.get("offline", 0),
-                "online_sec": iface.get("online", 0),
-                "uptime_sec": iface.get("uptime", 0),
-                "online": iface.get("status") == "online",
-                "status": iface.get("status"),
-                "up": iface.get("up")
-            }
         return result
 
-    async def update_wan_info(self):
+    async def update_wireless(self, snapshot: dict = None) -> dict:
         result = dict()
-        devices = self._configured_devices("wan_devices")
-        for device_id in devices:
-            response = await self._ubus.api_call(
-                "network.device",
-                "status",
-                dict(name=device_id)
-            )
-            stats = response.get("statistics", {})
-            _LOGGER.debug("WAN: %s", response)
-            result[device_id] = {
-                "up": response.get("up", False),
-                "rx_bytes": stats.get("rx_bytes", 0),
-                "tx_bytes": stats.get("tx_bytes", 0),
-                "speed": response.get("speed"),
-                "mac": response.get("macaddr"),
-            }
+        wireless_config = self._discovery_coordinator.data
+        result['wireless'], result['mesh'] = await self._run_batch(
+            self.update_ap(wireless_config['ap']),
+            self.update_mesh(wireless_config['mesh']),
+            snapshot=snapshot,
+        )
+        self._mesh.update(self._entry_id, result['mesh'])
+        fallback, _ = await self._run_batch(
+            self.update_mesh_peers(result['mesh']),
+            self.update_mesh_peers_each(result['mesh'], self._assoclist_per_peer),
+            snapshot=snapshot,
+        )
+        if fallback:
+            await self._run_batch(self.update_mesh_peers_each(result['mesh'], fallback), snapshot=snapshot)
         return result
 
+    @property
+    def snapshot_supported(self) -> bool:
+        return self._snapshot_allowed and self.is_api_supported(SNAPSHOT_OBJECT, "snapshot")
+
+    async def fetch_snapshot(self):
+        """Everything the fast tier needs from one `hass snapshot` call, None without the plugin."""
+        if not self.snapshot_supported:
+            return None
+        try:
+            snapshot = await self._ubus.api_call(SNAPSHOT_OBJECT, "snapshot", dict(wps=self._wps))
+        except PermissionError as err:
+            # The login worked again, only the ACL for the plugin is missing
+            _LOGGER.warning(f"Device [{self._id}] can't call {SNAPSHOT_OBJECT} snapshot, using regular polling: {err}")
+            self._snapshot_allowed = False
+            return None
+        if not snapshot or "error" in snapshot:
+            _LOGGER.warning(f"Device [{self._id}] {SNAPSHOT_OBJECT} snapshot failed: {snapshot.get('error') if snapshot else 'plugin is gone'}")
+            self._retry_catalog_refresh()
+            return None
+        return snapshot
+
+    async def do_install_plugin(self) -> dict:
+        """Upload the snapshot plugin and its ACL, then restart rpcd to load them."""
+        hass = self._coordinator.hass
+        source = await hass.async_add_executor_job(_read_plugin)
+        acl = {SNAPSHOT_ACL_GROUP: {
+            "description": "Home Assistant OpenWrt snapshot plugin",
+            "read": {"ubus": {SNAPSHOT_OBJECT: ["snapshot"]}},
+        }}
+        await self._ubus.api_call("file", "write", dict(path=SNAPSHOT_PLUGIN_PATH, data=source))
+        await self._ubus.api_call("file", "write", dict(path=SNAPSHOT_ACL_PATH, data=json.dumps(acl, indent=2)))
+        try:
+            await self._ubus.api_call("rc", "init", dict(name="rpcd", action="restart"))
+        except ConnectionError as err:
+            # rpcd may go away before answering
+            _LOGGER.debug("rpcd restart on [%s] ended with %s", self._id, err)
+        await asyncio.sleep(RPCD_RESTART_DELAY)
+        self._snapshot_allowed = True
+        await self.async_refresh_catalog()
+        return dict(installed=self.snapshot_supported)
+
     async def load_ubus(self):
         return await self._ubus.api_list()
 
-    def is_api_supported(self, name: str) -> bool:
-        if self._apis and name in self._apis:
-            return True
-        return False
+    async def async_load_catalog(self):
+        stored = await self._catalog_store.async_load()
+        if stored:
+            self._apis = compact_catalog(stored.get("objects", {}))
+            self._catalog_updated = stored.get("updated", 0)
+            _LOGGER.debug("Device [%s] loaded %d cached ubus objects", self._id, len(self._apis))
+        if not self._apis:
+            await self.async_refresh_catalog()
+
+    async def async_refresh_catalog(self):
+        self._apis = compact_catalog(await self.load_ubus())
+        self._catalog_updated = time.time()
+        await self._catalog_store.async_save(dict(
+            updated=self._catalog_updated,
+            objects={name: sorted(methods) for name, methods in self._apis.items()},
+        ))
+
+    def _schedule_catalog_refresh(self):
+        if self._catalog_task and not self._catalog_task.done():
+            return
+
+        async def refresh():
+            try:
+                await self.async_refresh_catalog()
+            except Exception as err:
+                _LOGGER.warning(f"Device [{self._id}] failed to refresh ubus catalog: {err}")
+        self._catalog_task = self._coordinator.hass.async_create_background_task(
+            refresh(), f"{DOMAIN} {self._id} ubus catalog refresh"
+        )
+
+    def _retry_catalog_refresh(self):
+        """Refresh the catalog after a failed call, at most every CATALOG_RETRY_INTERVAL."""
+        if time.time() - self._catalog_updated > CATALOG_RETRY_INTERVAL:
+            self._schedule_catalog_refresh()
+
+    def is_api_supported(self, name: str, method: str = None) -> bool:
+        if not self._apis or name not in self._apis:
+            return False
+        return method is None or method in self._apis[name]
+
+    async def async_update_info(self) -> dict:
+        info, = await self._run_batch(self.update_info())
+        return info
+
+    async def async_update_discovery(self) -> dict:
+        if self._apis is None:
+            await self.async_load_catalog()
+        elif time.time() - self._catalog_updated > CATALOG_REFRESH_INTERVAL:
+            self._schedule_catalog_refresh()
+        discovered, wan = await self._run_batch(self.discover_wireless(), self.discover_wan())
+        discovered["wan"] = wan
+        return discovered
+
+    async def async_update_fast(self) -> DeviceState:
+        idle = self._coordinator.data is None or not self._coordinator.last_update_success
+        if not idle and self._ubus.scheduler.pending(PRIORITY_INTERACTIVE):
+            # A user action is talking to the router, keep the current data until the
+            # next scheduled poll (set_wps() also asks for a refresh once done)
+            _LOGGER.debug("Device [%s] skipping a poll behind an interactive call", self._id)
+            self._ubus.scheduler.skipped_polls += 1
+            self._changed = set()
+            return self._coordinator.data
+        reconnected = self._coordinator.data is not None and not self._coordinator.last_update_success
+        result = dict()
+        started = time.monotonic()
+        try:
+            snapshot = await self.fetch_snapshot()
+            sections = await asyncio.gather(
+                self.update_system(snapshot),
+                self.update_wireless(snapshot),
+                return_exceptions=True,
+            )
+            for section in sections:
+                if isinstance(section, Exception):
+                    raise section
+                result.update(section)
+        except Exception:
+            self._adaptive.record_failure()
+            self.update_poll_interval()
+            raise
+        self._adaptive.record_success(time.monotonic() - started, result["load"])
+        self.update_poll_interval()
+        result = DeviceState(**result)
+        self._changed = None if reconnected else diff_state(self._coordinator.data, result)
+        self._clients.update(self._entry_id, self._id, result.wireless)
+        trace("Full update [%s]: %s", self._id, result)
+        if reconnected:
+            # The device may have been upgraded or replaced while offline
+            self._coordinator.hass.async_create_task(self._info_coordinator.async_request_refresh())
+            self._coordinator.hass.async_create_task(self._discovery_coordinator.async_request_refresh())
+            if self._push:
+                self._push.restart()
+        return result
 
-    def make_async_update_data(self):
+    def make_async_update_data(self, update, tier: str):
         async def async_update_data():
+            started = time.monotonic()
             try:
-                if not self._apis:
-                    self._apis = await self.load_ubus()
-                result = dict()
-                result["info"] = await self.update_info()
-                wireless_config = await self.discover_wireless()
-                result['wireless'] = await self.update_ap(wireless_config['ap'])
-                result['mesh'] = await self.update_mesh(wireless_config['mesh'])
-                result["mwan3"] = await self.discover_mwan3()
-                result["wan"] = await self.update_wan_info()
-                _LOGGER.debug(f"Full update [{self._id}]: {result}")
-                return result
+                return await update()
             except PermissionError as err:
                 raise ConfigEntryAuthFailed from err
             except Exception as err:
                 _LOGGER.exception(f"Device [{self._id}] async_update_data error: {err}")
                 raise UpdateFailed(f"OpenWrt communication error: {err}")
+            finally:
+                self._poll_latency[tier].add(time.monotonic() - started)
         return async_update_data
 
-def new_ubus_client(hass, config: dict) -> Ubus:
-    _LOGGER.debug(f"new_ubus_client(): {config}")
+def _read_plugin() -> str:
+    with open(os.path.join(os.path.dirname(__file__), "rpcd", "hass.uc"), encoding="utf-8") as handle:
+        return handle.read()
+
+def new_ubus_client(hass, config: dict, entry_id: str = None) -> Ubus:
+    _LOGGER.debug("new_ubus_client(): %s", Payload(config))
     schema = "https" if config["https"] else "http"
     port = ":%d" % (config["port"]) if config["port"] > 0 else ''
     url = "%s://%s%s%s" % (schema, config["address"], port, config["path"])
     return Ubus(
-        hass.async_add_executor_job,
+        async_get_clientsession(hass, verify_ssl=config.get("verify_cert", True)),
         url,
         config["username"],
         config.get("password", ""),
-        verify=config.get("verify_cert", True)
+        max_concurrency=config.get("max_concurrency", DEFAULT_MAX_CONCURRENCY),
+        session_store=session_store(hass, entry_id) if entry_id else None,
     )
 
-def new_coordinator(hass, config: dict, all_devices: dict) -> DeviceCoordinator:
-    _LOGGER.debug(f"new_coordinator: {config}, {all_devices}")
-    connection = new_ubus_client(hass, config)
-    device = DeviceCoordinator(hass, config, connection, all_devices)
+def new_coordinator(hass, config: dict, mesh: MeshRegistry, clients: ClientIndex, entry_id: str) -> DeviceCoordinator:
+    _LOGGER.debug("new_coordinator: %s", Payload(config))
+    connection = new_ubus_client(hass, config, entry_id)
+    device = DeviceCoordinator(hass, config, connection, mesh, clients, entry_id)
     return device
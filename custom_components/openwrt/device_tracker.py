@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.components.device_tracker import SourceType
+from homeassistant.components.device_tracker.config_entry import ScannerEntity
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers import entity_registry as er
+from homeassistant.util import dt as dt_util
+
+import logging
+
+from .clients import ClientIndex
+from .constants import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+
+async def async_setup_entry(
+    hass: HomeAssistant,
+    entry: ConfigEntry,
+    async_add_entities
+) -> None:
+    index = hass.data[DOMAIN]['clients']
+    entities = {}
+
+    def add(macs):
+        added = [ClientTracker(index, mac) for mac in index.adopt(entry.entry_id, macs)]
+        entities.update({entity.mac_address: entity for entity in added})
+        if added:
+            async_add_entities(added)
+
+    @callback
+    def sync(macs: set):
+        for mac in macs:
+            if (entity := entities.get(mac)) is not None and entity.hass is not None:
+                entity.async_write_ha_state()
+        seen = index.seen_by(entry.entry_id)
+        add([mac for mac in macs if mac not in entities and mac in seen])
+
+    # Clients known from previous runs are shown away until they show up again
+    registry = er.async_get(hass)
+    add([
+        item.unique_id for item in er.async_entries_for_config_entry(registry, entry.entry_id)
+        if item.domain == "device_tracker"
+    ])
+    add(index.seen_by(entry.entry_id))
+    entry.async_on_unload(index.async_add_listener(entry.entry_id, sync))
+    return True
+
+
+class ClientTracker(ScannerEntity):
+    """Wireless client of any OpenWrt access point, follows it while roaming."""
+
+    _attr_should_poll = False
+
+    def __init__(self, index: ClientIndex, mac: str):
+        self._index = index
+        self._mac = mac
+        self._attr_name = f"OpenWrt client [{mac.upper()}]"
+
+    @property
+    def source_type(self):
+        return SourceType.ROUTER
+
+    @property
+    def mac_address(self) -> str:
+        return self._mac
+
+    @property
+    def is_connected(self) -> bool:
+        return self._index.location(self._mac) is not None
+
+    @property
+    def icon(self):
+        return "mdi:lan-connect" if self.is_connected else "mdi:lan-disconnect"
+
+    @property
+    def extra_state_attributes(self):
+        location = self._index.location(self._mac)
+        last_seen = self._index.last_seen(self._mac)
+        return dict(
+            router=location.router if location else None,
+            interface=location.ifname if location else None,
+            signal=location.signal if location else None,
+            last_seen=dt_util.utc_from_timestamp(last_seen).isoformat() if last_seen else None,
+        )
@@ -0,0 +1,20 @@
+from __future__ import annotations
+
+from dataclasses import asdict
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .constants import DOMAIN
+
+TO_REDACT = {"password", "username", "address", "macs", "attributes", "peers", "mac", "mesh_id"}
+
+
+async def async_get_config_entry_diagnostics(hass: HomeAssistant, entry: ConfigEntry) -> dict:
+    device = hass.data[DOMAIN]['devices'][entry.entry_id]
+    return dict(
+        config=async_redact_data(entry.as_dict()['data'], TO_REDACT),
+        stats=device.diagnostics,
+        data=async_redact_data(asdict(device.coordinator.data), TO_REDACT),
+    )
@@ -0,0 +1,42 @@
+from datetime import timedelta
+import random
+
+MAX_BACKOFF: timedelta = timedelta(minutes=15)
+MAX_STRETCH: float = 4.0
+SLOW_POLL: float = 2.0
+HIGH_LOAD: float = 2.0
+JITTER: float = 0.2
+
+
+class AdaptiveInterval:
+    """Poll interval factor driven by failures, poll duration and router load.
+
+    Consecutive failures back off exponentially (with jitter so a fleet
+    behind one broken uplink doesn't retry in lockstep), slow or loaded
+    routers are polled less often, and a success snaps back right away.
+    """
+
+    def __init__(self):
+        self.failures = 0
+        self.duration = None
+        self.load = None
+        self._factor = 1.0
+
+    def record_success(self, duration: float, load: float = None):
+        self.failures = 0
+        self.duration = duration
+        self.load = load
+        factor = max(1.0, duration / SLOW_POLL)
+        if load is not None:
+            factor = max(factor, load / HIGH_LOAD)
+        self._factor = min(factor, MAX_STRETCH)
+
+    def record_failure(self):
+        self.failures += 1
+        self._factor = 2 ** min(self.failures, 10) * random.uniform(1 - JITTER, 1 + JITTER)
+
+    def interval(self, base: timedelta) -> timedelta:
+        interval = base * self._factor
+        if self.failures:
+            return min(interval, max(base, MAX_BACKOFF))
+        return interval
@@ -0,0 +1,75 @@
+"""Cheap debug logging for the polling hot path.
+
+Payloads (requests, responses, parsed results) only go to the `trace`
+logger, they are formatted when a record is actually emitted, sampled and
+truncated so that a debug session on a large fleet stays readable.
+"""
+import dataclasses
+import json
+import logging
+
+TRACE_LOGGER = logging.getLogger(f"{__package__}.trace")
+
+REDACTED: str = "**REDACTED**"
+REDACT_KEYS: frozenset = frozenset({"password", "ubus_rpc_session", "session_id", "username"})
+
+DEFAULT_TRACE_SAMPLE: int = 1
+DEFAULT_TRACE_MAX_LENGTH: int = 2048
+
+_trace = dict(sample=DEFAULT_TRACE_SAMPLE, max_length=DEFAULT_TRACE_MAX_LENGTH, count=0)
+
+
+def configure_trace(sample: int = DEFAULT_TRACE_SAMPLE, max_length: int = DEFAULT_TRACE_MAX_LENGTH):
+    """Log one payload out of `sample`, cut each one to `max_length` characters (0: no limit)."""
+    _trace.update(sample=max(1, sample), max_length=max(0, max_length), count=0)
+
+
+def redact(value):
+    """Copy of `value` without credentials, including the session of JSON-RPC requests."""
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        value = dataclasses.asdict(value)
+    if isinstance(value, list):
+        return [redact(item) for item in value]
+    if not isinstance(value, dict):
+        return value
+    result = {key: REDACTED if key in REDACT_KEYS else redact(item) for key, item in value.items()}
+    params = result.get("params")
+    if "jsonrpc" in result and isinstance(params, list) and params:
+        result["params"] = [REDACTED, *params[1:]]
+    return result
+
+
+class Payload:
+    """Deferred, redacted and truncated rendering of a payload for %-style logging."""
+
+    __slots__ = ("_value", "_max_length")
+
+    def __init__(self, value, max_length: int = None):
+        self._value = value
+        self._max_length = _trace["max_length"] if max_length is None else max_length
+
+    def __str__(self) -> str:
+        value = self._value
+        if isinstance(value, (str, bytes)):
+            try:
+                value = json.loads(value)
+            except ValueError:
+                value = value.decode("utf-8", "replace") if isinstance(value, bytes) else value
+        text = value if isinstance(value, str) else json.dumps(redact(value), default=str)
+        if self._max_length and len(text) > self._max_length:
+            return f"{text[:self._max_length]}... ({len(text)} chars)"
+        return text
+
+
+def trace(message: str, *args):
+    """Log `message` on the trace logger, the last argument being the payload.
+
+    Costs a level check when tracing is off, the payload is only serialized
+    for the sampled records.
+    """
+    if not TRACE_LOGGER.isEnabledFor(logging.DEBUG):
+        return
+    _trace["count"] += 1
+    if (_trace["count"] - 1) % _trace["sample"]:
+        return
+    TRACE_LOGGER.debug(message, *args[:-1], Payload(args[-1]))
@@ -0,0 +1,55 @@
+import logging
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class MeshRegistry:
+    """Mesh membership shared by all config entries: mesh_id -> {mac: entry_id}.
+
+    Each device reports its own mesh interfaces after an update, listeners
+    are told which mesh ids gained or lost members.
+    """
+
+    def __init__(self):
+        self._members = {}
+        self._entries = {}
+        self._listeners = {}
+
+    def peers(self, mesh_id: str) -> dict:
+        return self._members.get(mesh_id, {})
+
+    def update(self, entry_id: str, mesh: dict):
+        current = {(info.mesh_id, info.mac) for info in mesh.values()}
+        previous = self._entries.get(entry_id, set())
+        if current == previous:
+            return
+        for mesh_id, mac in previous - current:
+            members = self._members.get(mesh_id, {})
+            members.pop(mac, None)
+            if not members:
+                self._members.pop(mesh_id, None)
+        for mesh_id, mac in current - previous:
+            self._members.setdefault(mesh_id, {})[mac] = entry_id
+        if current:
+            self._entries[entry_id] = current
+        else:
+            self._entries.pop(entry_id, None)
+        self._notify(entry_id, {mesh_id for mesh_id, _ in current ^ previous})
+
+    def remove(self, entry_id: str):
+        self.update(entry_id, {})
+        self._listeners.pop(entry_id, None)
+
+    def async_add_listener(self, entry_id: str, callback):
+        self._listeners[entry_id] = callback
+
+        def remove_listener():
+            if self._listeners.get(entry_id) is callback:
+                self._listeners.pop(entry_id)
+        return remove_listener
+
+    def _notify(self, source: str, mesh_ids: set):
+        _LOGGER.debug("Mesh membership changed by [%s]: %s", source, mesh_ids)
+        for entry_id, callback in list(self._listeners.items()):
+            if entry_id != source:
+                callback(mesh_ids)
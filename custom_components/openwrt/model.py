@@ -0,0 +1,136 @@
+"""State of a router as produced by the fast coordinator.
+
+Values derived from the raw ubus data (client totals, active peers, entity
+attributes) are computed once per update, entity properties only read them.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+
+
+def signal_attributes(stations: dict) -> dict:
+    return {mac.upper(): f"{station.signal} dBm" for mac, station in stations.items()}
+
+
+@dataclass(slots=True)
+class Client:
+    signal: int | None = None
+
+
+@dataclass(slots=True)
+class WirelessInterface:
+    macs: dict[str, Client] = field(default_factory=dict)
+    wps: bool | None = None
+    attributes: dict = field(default_factory=dict, compare=False, repr=False)
+
+    def __post_init__(self):
+        self.attributes = signal_attributes(self.macs)
+
+    @property
+    def clients(self) -> int:
+        return len(self.macs)
+
+
+@dataclass(slots=True)
+class MeshPeer:
+    active: bool
+    signal: int = -100
+    noise: int = 0
+
+
+@dataclass(slots=True)
+class MeshInterface:
+    mac: str
+    mesh_id: str
+    signal: int = -100
+    noise: int = 0
+    bitrate: int = -1
+    peers: dict[str, MeshPeer] = field(default_factory=dict)
+    active_peers: int = field(default=0, compare=False)
+    attributes: dict = field(default_factory=dict, compare=False, repr=False)
+
+    def set_peer(self, mac: str, peer: MeshPeer):
+        previous = self.peers.get(mac)
+        self.peers[mac] = peer
+        self.active_peers += int(peer.active) - int(previous.active if previous else False)
+        self.attributes[mac.upper()] = f"{peer.signal} dBm"
+
+
+@dataclass(slots=True)
+class Mwan3Interface:
+    status: str | None = None
+    online: bool = False
+    up: bool | None = None
+    online_sec: int = 0
+    offline_sec: int = 0
+    uptime_sec: int = 0
+    online_ratio: float = field(default=100, compare=False)
+
+    def __post_init__(self):
+        if self.uptime_sec:
+            self.online_ratio = round(self.online_sec / self.uptime_sec * 100, 1)
+
+
+@dataclass(slots=True)
+class WanCounters:
+    up: bool = False
+    rx_bytes: int = 0
+    tx_bytes: int = 0
+    speed: str | None = None
+    mac: str | None = None
+    rx_rate: int | None = None
+    tx_rate: int | None = None
+    rx_rate_avg: int | None = None
+    tx_rate_avg: int | None = None
+
+
+@dataclass(slots=True)
+class DeviceState:
+    wireless: dict[str, WirelessInterface] = field(default_factory=dict)
+    mesh: dict[str, MeshInterface] = field(default_factory=dict)
+    mwan3: dict[str, Mwan3Interface] = field(default_factory=dict)
+    wan: dict[str, WanCounters] = field(default_factory=dict)
+    load: float | None = None
+    total_clients: int = field(default=0, compare=False)
+
+    def __post_init__(self):
+        self.total_clients = sum(iface.clients for iface in self.wireless.values())
+
+    def add_client(self, ifname: str, mac: str, client: Client) -> bool:
+        """Record a client joining `ifname`, False if nothing changed."""
+        iface = self.wireless.get(ifname)
+        if iface is None or mac in iface.macs:
+            return False
+        iface.macs[mac] = client
+        iface.attributes[mac.upper()] = f"{client.signal} dBm"
+        self.total_clients += 1
+        return True
+
+    def remove_client(self, ifname: str, mac: str) -> bool:
+        """Record a client leaving `ifname`, False if nothing changed."""
+        iface = self.wireless.get(ifname)
+        if iface is None or iface.macs.pop(mac, None) is None:
+            return False
+        iface.attributes.pop(mac.upper(), None)
+        self.total_clients -= 1
+        return True
+
+
+SECTIONS: tuple = ("wireless", "mesh", "mwan3", "wan")
+
+
+def diff_state(old: DeviceState | None, new: DeviceState) -> set | None:
+    """Inputs that differ between two states, None when everything must be refreshed.
+
+    A changed item is reported both as `(section, key)` and as `section`.
+    """
+    if old is None:
+        return None
+    changed = set()
+    for section in SECTIONS:
+        before, after = getattr(old, section), getattr(new, section)
+        for key in before.keys() | after.keys():
+            if before.get(key) != after.get(key):
+                changed.add((section, key))
+                changed.add(section)
+    return changed
@@ -0,0 +1,66 @@
+"""Size limits and parsing of `file exec` output."""
+from __future__ import annotations
+
+import logging
+import os
+
+from homeassistant.util.json import json_loads
+
+_LOGGER = logging.getLogger(__name__)
+
+# Output files kept in the exec directory, older ones are deleted
+OUTPUT_FILES_KEPT: int = 50
+
+
+def truncate_output(data: str, limit: int) -> str:
+    """Cut `data` to `limit` characters at a line boundary when possible, marking the cut."""
+    if not limit or len(data) <= limit:
+        return data
+    head = data[:limit]
+    if (newline := head.rfind("\n")) > limit // 2:
+        head = head[:newline + 1]
+    separator = "" if head.endswith("\n") else "\n"
+    return f"{head}{separator}[... truncated {len(data) - len(head)} of {len(data)} characters]"
+
+
+def parse_output(data: str, mode: str = "auto"):
+    """Return output as parsed JSON, a list of lines or the text itself.
+
+    In `auto` mode JSON is only tried when the text starts like a JSON
+    document, plain text output goes straight to line splitting.
+    """
+    if mode == "raw":
+        return data
+    if mode == "json" or (mode == "auto" and data.lstrip()[:1] in ("{", "[")):
+        try:
+            value = json_loads(data)
+            if isinstance(value, (list, dict)):
+                return value
+        except ValueError as err:
+            _LOGGER.debug("Failed to parse JSON output: %s", err)
+    return data.strip().split("\n")
+
+
+def write_output(path: str, data: str) -> str:
+    """Store output in `path` and drop the oldest files next to it, runs in the executor."""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as handle:
+        handle.write(data)
+    prune_outputs(directory, OUTPUT_FILES_KEPT)
+    return path
+
+
+def prune_outputs(directory: str, keep: int):
+    """Delete all but the `keep` most recent output files in `directory`."""
+    with os.scandir(directory) as entries:
+        files = sorted(
+            (entry for entry in entries if entry.is_file() and entry.name.endswith(".txt")),
+            key=lambda entry: entry.stat().st_mtime,
+            reverse=True,
+        )
+    for entry in files[keep:]:
+        try:
+            os.remove(entry.path)
+        except OSError as err:
+            _LOGGER.debug("Failed to remove old output %s: %s", entry.path, err)
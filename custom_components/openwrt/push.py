@@ -0,0 +1,116 @@
+from datetime import timedelta
+import asyncio
+import logging
+
+from .constants import DOMAIN
+from .model import Client
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_PUSH_INTERVAL: int = 300
+RETRY_MIN: int = 5
+RETRY_MAX: int = 300
+
+JOIN_EVENTS = {"assoc", "sta-authorized"}
+LEAVE_EVENTS = {"disassoc", "deauth"}
+
+
+class HostapdPush:
+    """Applies hostapd association events to the fast coordinator data.
+
+    While every AP interface has a live subscription the coordinator only
+    polls every `push_interval` seconds, a dropped stream restores the
+    regular polling until it reconnects. A stream that stays silent for
+    `push_interval` is reopened, a router that rebooted without closing the
+    socket can't keep it looking connected.
+    """
+
+    def __init__(self, device, interval: int, push_interval: int):
+        self._device = device
+        self._interval = timedelta(seconds=interval)
+        self._push_interval = timedelta(seconds=max(interval, push_interval))
+        self._tasks = {}
+        self._connected = set()
+
+    @property
+    def connected(self) -> bool:
+        return len(self._tasks) > 0 and self._connected == set(self._tasks)
+
+    @property
+    def poll_interval(self) -> timedelta:
+        return self._push_interval if self.connected else self._interval
+
+    def sync(self, interfaces):
+        """Subscribe to new AP interfaces and drop the ones that are gone."""
+        hass = self._device.coordinator.hass
+        for ifname in set(self._tasks) - set(interfaces):
+            self._tasks.pop(ifname).cancel()
+            self._connected.discard(ifname)
+        for ifname in set(interfaces) - set(self._tasks):
+            self._tasks[ifname] = hass.async_create_background_task(
+                self._async_subscribe(ifname), f"{DOMAIN} {self._device.id} hostapd.{ifname} events"
+            )
+        self._update_interval()
+
+    def restart(self):
+        """Reopen all streams, the router may have dropped them while unreachable."""
+        interfaces = list(self._tasks)
+        self.stop()
+        self.sync(interfaces)
+
+    def stop(self):
+        for task in self._tasks.values():
+            task.cancel()
+        self._tasks = {}
+        self._connected = set()
+
+    def _update_interval(self):
+        self._device.update_poll_interval()
+
+    def _set_connected(self, ifname: str, connected: bool):
+        if connected:
+            self._connected.add(ifname)
+        else:
+            self._connected.discard(ifname)
+        self._update_interval()
+
+    async def _async_subscribe(self, ifname: str):
+        retry = RETRY_MIN
+        while True:
+            try:
+                async for event, data in self._device.ubus.subscribe(
+                    f"hostapd.{ifname}",
+                    on_connect=lambda: self._set_connected(ifname, True),
+                    read_timeout=self._push_interval.total_seconds(),
+                ):
+                    retry = RETRY_MIN
+                    self._handle_event(ifname, event, data)
+                _LOGGER.info(f"Device [{self._device.id}] hostapd.{ifname} event stream closed")
+            except asyncio.CancelledError:
+                raise
+            except asyncio.TimeoutError:
+                # A quiet AP looks the same as a dead socket, reconnect right away;
+                # if the router is really gone the next attempt fails
+                _LOGGER.debug("Device [%s] hostapd.%s event stream idle, reconnecting", self._device.id, ifname)
+                continue
+            except Exception as err:
+                _LOGGER.warning(f"Device [{self._device.id}] hostapd.{ifname} event stream failed: {err!r}")
+            self._set_connected(ifname, False)
+            await asyncio.sleep(retry)
+            retry = min(retry * 2, RETRY_MAX)
+
+    def _handle_event(self, ifname: str, event: str, data):
+        if event not in JOIN_EVENTS and event not in LEAVE_EVENTS:
+            return
+        state = self._device.coordinator.data
+        mac = data.get("address") if isinstance(data, dict) else None
+        if not mac or state is None:
+            return
+        if event in JOIN_EVENTS:
+            changed = state.add_client(ifname, mac, Client(signal=data.get("signal")))
+        else:
+            changed = state.remove_client(ifname, mac)
+        if not changed:
+            return
+        _LOGGER.debug("Device [%s] %s %s %s: %d clients", self._device.id, ifname, event, mac, state.wireless[ifname].clients)
+        self._device.set_updated_data({("wireless", ifname), "wireless"})
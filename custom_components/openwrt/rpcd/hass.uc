@@ -0,0 +1,64 @@
+// rpcd plugin for the Home Assistant OpenWrt integration.
+//
+// Install as /usr/share/rpcd/ucode/hass.uc (needs rpcd-mod-ucode) and restart
+// rpcd. `ubus call hass snapshot '{"wps": false}'` then returns everything the
+// integration polls, gathered on the router in one request.
+
+'use strict';
+
+import { connect } from 'ubus';
+
+function collect(conn, wps) {
+	let call = (object, method, args) => conn.call(object, method, args ?? {});
+	let objects = conn.list() ?? [];
+	let snapshot = {
+		info: call('system', 'info'),
+		devices: call('network.device', 'status'),
+		mwan3: (index(objects, 'mwan3') >= 0) ? call('mwan3', 'status', { section: 'interfaces' }) : null,
+		hostapd: {},
+		iwinfo: {}
+	};
+
+	for (let name in objects) {
+		if (substr(name, 0, 8) != 'hostapd.')
+			continue;
+
+		snapshot.hostapd[substr(name, 8)] = {
+			clients: call(name, 'get_clients'),
+			wps: wps ? call(name, 'wps_status') : null
+		};
+	}
+
+	for (let radio, state in call('network.wireless', 'status') ?? {}) {
+		for (let iface in state.interfaces ?? []) {
+			if (iface.config?.mode != 'mesh' || !iface.ifname)
+				continue;
+
+			snapshot.iwinfo[iface.ifname] = {
+				info: call('iwinfo', 'info', { device: iface.ifname }),
+				assoclist: call('iwinfo', 'assoclist', { device: iface.ifname })
+			};
+		}
+	}
+
+	return snapshot;
+}
+
+return {
+	hass: {
+		snapshot: {
+			args: { wps: false },
+			call: function(request) {
+				let conn = connect();
+
+				if (!conn)
+					return { error: 'Unable to connect to ubus' };
+
+				let snapshot = collect(conn, request.args.wps);
+				conn.disconnect();
+
+				return snapshot;
+			}
+		}
+	}
+};
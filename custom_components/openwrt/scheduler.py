@@ -0,0 +1,84 @@
+from collections import Counter
+from contextlib import asynccontextmanager
+import asyncio
+import heapq
+
+PRIORITY_INTERACTIVE: int = 0
+PRIORITY_SERVICE: int = 1
+PRIORITY_POLL: int = 2
+
+PRIORITY_NAMES: tuple = ("interactive", "service", "poll")
+
+
+class RequestScheduler:
+    """Limits the requests in flight to one router, free slots go by priority.
+
+    Queued requests are served interactive (writes) first, then service
+    reads, then polling, in arrival order within a class. A request already
+    sent is never interrupted.
+    """
+
+    def __init__(self, limit: int):
+        self._limit = max(1, limit)
+        self._in_flight = 0
+        self._active = Counter()
+        self._waiters = []
+        self._seq = 0
+        self.waited = Counter()
+        self.skipped_polls = 0
+
+    def pending(self, priority: int) -> bool:
+        """Whether a request of the `priority` class is queued or in flight."""
+        return self._active[priority] > 0 or any(item[0] == priority for item in self._waiters)
+
+    @asynccontextmanager
+    async def slot(self, priority: int):
+        await self._acquire(priority)
+        try:
+            yield
+        finally:
+            self._release(priority)
+
+    async def _acquire(self, priority: int):
+        if self._in_flight < self._limit and not self._waiters:
+            self._grant(priority)
+            return
+        self.waited[priority] += 1
+        future = asyncio.get_running_loop().create_future()
+        entry = (priority, self._seq, future)
+        self._seq += 1
+        heapq.heappush(self._waiters, entry)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just before the cancellation
+                self._release(priority)
+            elif entry in self._waiters:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+            raise
+
+    def _grant(self, priority: int):
+        self._in_flight += 1
+        self._active[priority] += 1
+
+    def _release(self, priority: int):
+        self._in_flight -= 1
+        self._active[priority] -= 1
+        while self._waiters and self._in_flight < self._limit:
+            priority, _, future = heapq.heappop(self._waiters)
+            if future.done():
+                continue
+            self._grant(priority)
+            future.set_result(None)
+
+    @property
+    def stats(self) -> dict:
+        return dict(
+            limit=self._limit,
+            in_flight=self._in_flight,
+            queued=len(self._waiters),
+            waited={PRIORITY_NAMES[priority]: count for priority, count in self.waited.items()},
+            skipped_polls=self.skipped_polls,
+        )
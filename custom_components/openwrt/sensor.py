@@ -8,7 +8,7 @@ from homeassistant.components.sensor import SensorDeviceClass
 
 import logging
 
-from . import OpenWrtEntity
+from . import OpenWrtEntity, async_track_entities
 from .constants import DOMAIN
 
 _LOGGER = logging.getLogger(__name__)
@@ -20,38 +20,47 @@ async def async_setup_entry(
     async_add_entities
 ) -> None:
 
-    entities = []
     data = entry.as_dict()
     device = hass.data[DOMAIN]['devices'][entry.entry_id]
     device_id = data['data']['id']
 
-    wireless = []
-    for net_id in device.coordinator.data['wireless']:
-        sensor = WirelessClientsSensor(device, device_id, net_id)
-        wireless.append(sensor)
-        entities.append(sensor)
-    if len(wireless) > 0:
-        entities.append(WirelessTotalClientsSensor(
-            device, device_id, wireless))
-    for net_id in device.coordinator.data['mesh']:
-        entities.append(
-            MeshSignalSensor(device, device_id, net_id)
-        )
-        entities.append(
-            MeshPeersSensor(device, device_id, net_id)
-        )
-    for net_id in device.coordinator.data["mwan3"]:
-        entities.append(
-            Mwan3OnlineSensor(device, device_id, net_id)
-        )
-    for net_id in device.coordinator.data["wan"]:
-        entities.append(
-            WanRxTxSensor(device, device_id, net_id, "rx")
-        )
-        entities.append(
-            WanRxTxSensor(device, device_id, net_id, "tx")
-        )
-    async_add_entities(entities)
+    def keys(state):
+        yield from (("wireless", net_id) for net_id in state.wireless)
+        if len(state.wireless) > 0:
+            yield ("total_clients",)
+        yield from (("mesh", net_id) for net_id in state.mesh)
+        yield from (("mwan3", net_id) for net_id in state.mwan3)
+        yield from (("wan", net_id) for net_id in state.wan)
+
+    def create(key):
+        if key[0] == "wireless":
+            return [WirelessClientsSensor(device, device_id, key[1])]
+        if key[0] == "total_clients":
+            return [WirelessTotalClientsSensor(device, device_id)]
+        if key[0] == "mesh":
+            return [
+                MeshSignalSensor(device, device_id, key[1]),
+                MeshPeersSensor(device, device_id, key[1]),
+            ]
+        if key[0] == "mwan3":
+            return [Mwan3OnlineSensor(device, device_id, key[1])]
+        return [
+            WanRxTxSensor(device, device_id, key[1], "rx"),
+            WanRxTxSensor(device, device_id, key[1], "tx"),
+            WanRateSensor(device, device_id, key[1], "rx", False),
+            WanRateSensor(device, device_id, key[1], "tx", False),
+            WanRateSensor(device, device_id, key[1], "rx", True),
+            WanRateSensor(device, device_id, key[1], "tx", True),
+        ]
+
+    async_add_entities([
+        UbusCacheSensor(device, device_id),
+        UbusRequestsSensor(device, device_id),
+        UbusLatencySensor(device, device_id),
+        UbusErrorsSensor(device, device_id),
+        PollIntervalSensor(device, device_id),
+    ])
+    async_track_entities(hass, entry, device, async_add_entities, keys, create)
     return True
 
 
@@ -68,8 +77,14 @@ class WirelessClientsSensor(OpenWrtSensor):
 
     def __init__(self, device, device_id: str, interface: str):
         super().__init__(device, device_id)
+        self._inputs = (("wireless", interface),)
         self._interface_id = interface
 
+    @property
+    def _info(self):
+        # Missing for a few polls before the entity is removed
+        return self.data.wireless.get(self._interface_id)
+
     @property
     def unique_id(self):
         return "%s.%s.clients" % (super().unique_id, self._interface_id)
@@ -80,20 +95,15 @@ class WirelessClientsSensor(OpenWrtSensor):
 
     @property
     def state(self):
-        return self.data['wireless'][self._interface_id]['clients']
+        return self._info.clients if self._info else None
 
     @property
     def icon(self):
-        return 'mdi:wifi-off' if self.state == 0 else 'mdi:wifi'
+        return 'mdi:wifi' if self.state else 'mdi:wifi-off'
 
     @property
     def extra_state_attributes(self):
-        result = dict()
-        data = self.data['wireless'][self._interface_id]
-        for key, value in data.get("macs", {}).items():
-            signal = value.get("signal", 0)
-            result[key.upper()] = f"{signal} dBm"
-        return result
+        return self._info.attributes if self._info else None
 
     @property
     def entity_category(self):
@@ -104,8 +114,13 @@ class MeshSignalSensor(OpenWrtSensor):
 
     def __init__(self, device, device_id: str, interface: str):
         super().__init__(device, device_id)
+        self._inputs = (("mesh", interface),)
         self._interface_id = interface
 
+    @property
+    def _info(self):
+        return self.data.mesh.get(self._interface_id)
+
     @property
     def unique_id(self):
         return "%s.%s.mesh_signal" % (super().unique_id, self._interface_id)
@@ -116,8 +131,7 @@ class MeshSignalSensor(OpenWrtSensor):
 
     @property
     def state(self):
-        value = self.data['mesh'][self._interface_id]['signal']
-        return f"{value} dBm"
+        return f"{self._info.signal} dBm" if self._info else None
 
     @property
     def device_class(self):
@@ -125,10 +139,9 @@ class MeshSignalSensor(OpenWrtSensor):
 
     @property
     def signal_strength(self):
-        value = self.data['mesh'][self._interface_id]['signal']
         levels = [-50, -60, -67, -70, -80]
         for idx, level in enumerate(levels):
-            if value >= level:
+            if self._info and self._info.signal >= level:
                 return idx
         return len(levels)
 
@@ -147,8 +160,13 @@ class MeshPeersSensor(OpenWrtSensor):
 
     def __init__(self, device, device_id: str, interface: str):
         super().__init__(device, device_id)
+        self._inputs = (("mesh", interface),)
         self._interface_id = interface
 
+    @property
+    def _info(self):
+        return self.data.mesh.get(self._interface_id)
+
     @property
     def unique_id(self):
         return "%s.%s.mesh_peers" % (super().unique_id, self._interface_id)
@@ -159,21 +177,15 @@ class MeshPeersSensor(OpenWrtSensor):
 
     @property
     def state(self):
-        peers = self.data["mesh"][self._interface_id]["peers"]
-        return len(list(filter(lambda x: x["active"], peers.values())))
+        return self._info.active_peers if self._info else None
 
     @property
     def icon(self):
-        return 'mdi:server-network' if self.state > 0 else 'mdi:server-network-off'
+        return 'mdi:server-network' if self.state else 'mdi:server-network-off'
 
     @property
     def extra_state_attributes(self):
-        result = dict()
-        data = self.data["mesh"][self._interface_id]
-        for key, value in data.get("peers", {}).items():
-            signal = value.get("signal", 0)
-            result[key.upper()] = f"{signal} dBm"
-        return result
+        return self._info.attributes if self._info else None
 
     @property
     def entity_category(self):
@@ -182,9 +194,9 @@ class MeshPeersSensor(OpenWrtSensor):
 
 class WirelessTotalClientsSensor(OpenWrtSensor):
 
-    def __init__(self, device, device_id: str, sensors):
+    def __init__(self, device, device_id: str):
         super().__init__(device, device_id)
-        self._sensors = sensors
+        self._inputs = ("wireless",)
 
     @property
     def unique_id(self):
@@ -196,10 +208,7 @@ class WirelessTotalClientsSensor(OpenWrtSensor):
 
     @property
     def state(self):
-        total = 0
-        for item in self._sensors:
-            total += item.state
-        return total
+        return self.data.total_clients
 
     @property
     def icon(self):
@@ -210,6 +219,7 @@ class Mwan3OnlineSensor(OpenWrtSensor):
 
     def __init__(self, device, device_id: str, interface: str):
         super().__init__(device, device_id)
+        self._inputs = (("mwan3", interface),)
         self._interface_id = interface
         self._attr_native_unit_of_measurement = "%"
         self._attr_icon = "mdi:router-network"
@@ -217,7 +227,7 @@ class Mwan3OnlineSensor(OpenWrtSensor):
 
     @property
     def available(self):
-        return self._interface_id in self.data["mwan3"]
+        return self._interface_id in self.data.mwan3
 
     @property
     def unique_id(self):
@@ -229,16 +239,15 @@ class Mwan3OnlineSensor(OpenWrtSensor):
 
     @property
     def native_value(self):
-        data = self.data["mwan3"].get(self._interface_id, {})
-        value = data.get("online_sec") / data.get("uptime_sec") * \
-            100 if data.get("uptime_sec") else 100
-        return round(value, 1)
+        iface = self.data.mwan3.get(self._interface_id)
+        return iface.online_ratio if iface else 100
 
 
 class WanRxTxSensor(OpenWrtSensor):
 
     def __init__(self, device, device_id: str, interface: str, code: str):
         super().__init__(device, device_id)
+        self._inputs = (("wan", interface),)
         self._interface = interface
         self._code = code
         self._attr_entity_category = EntityCategory.DIAGNOSTIC
@@ -246,13 +255,13 @@ class WanRxTxSensor(OpenWrtSensor):
         self._attr_device_class = SensorDeviceClass.DATA_SIZE
         self._attr_native_unit_of_measurement = "B"
 
-    @property 
+    @property
     def _data(self):
-        return self.data["wan"].get(self._interface) 
+        return self.data.wan.get(self._interface)
 
     @property
     def available(self):
-        return self._interface in self.data["wan"] and self._data.get("up")
+        return self._interface in self.data.wan and self._data.up
 
     @property
     def unique_id(self):
@@ -264,12 +273,205 @@ class WanRxTxSensor(OpenWrtSensor):
 
     @property
     def native_value(self):
-        return self._data.get(f"{self._code}_bytes")
+        return self._data.rx_bytes if self._code == "rx" else self._data.tx_bytes
+
+    @property
+    def extra_state_attributes(self):
+        return dict(mac=self._data.mac, speed=self._data.speed)
+
+    @property
+    def state_class(self):
+        return "total_increasing"
+
+
+class WanRateSensor(OpenWrtSensor):
+
+    def __init__(self, device, device_id: str, interface: str, code: str, average: bool):
+        super().__init__(device, device_id)
+        self._inputs = (("wan", interface),)
+        self._interface = interface
+        self._code = code
+        self._field = f"{code}_rate_avg" if average else f"{code}_rate"
+        self._average = average
+        self._attr_entity_category = EntityCategory.DIAGNOSTIC
+        self._attr_icon = "mdi:download-network" if code == "rx" else "mdi:upload-network"
+        self._attr_device_class = SensorDeviceClass.DATA_RATE
+        self._attr_native_unit_of_measurement = "bit/s"
+
+    @property
+    def _data(self):
+        return self.data.wan.get(self._interface)
+
+    @property
+    def available(self):
+        return self._interface in self.data.wan and self._data.up
+
+    @property
+    def unique_id(self):
+        return "%s.%s.%s" % (super().unique_id, self._interface, f"wan_{self._field}")
+
+    @property
+    def name(self):
+        rate = "average rate" if self._average else "rate"
+        return f"{super().name} Wan [{self._interface}] {self._code.capitalize()} {rate}"
+
+    @property
+    def native_value(self):
+        return getattr(self._data, self._field)
+
+
+class UbusCacheSensor(OpenWrtSensor):
+
+    def __init__(self, device, device_id: str):
+        super().__init__(device, device_id)
+        self._attr_entity_category = EntityCategory.DIAGNOSTIC
+        self._attr_entity_registry_enabled_default = False
+        self._attr_icon = "mdi:cached"
+
+    @property
+    def unique_id(self):
+        return "%s.ubus_cache_hits" % (super().unique_id)
+
+    @property
+    def name(self):
+        return f"{super().name} Ubus cache hits"
+
+    @property
+    def native_value(self):
+        return self._device.cache_stats["hits"]
+
+    @property
+    def extra_state_attributes(self):
+        return self._device.cache_stats
+
+    @property
+    def state_class(self):
+        return "total_increasing"
+
+
+class UbusRequestsSensor(OpenWrtSensor):
+
+    def __init__(self, device, device_id: str):
+        super().__init__(device, device_id)
+        self._attr_entity_category = EntityCategory.DIAGNOSTIC
+        self._attr_entity_registry_enabled_default = False
+        self._attr_icon = "mdi:swap-vertical"
+
+    @property
+    def unique_id(self):
+        return "%s.ubus_requests" % (super().unique_id)
+
+    @property
+    def name(self):
+        return f"{super().name} Ubus requests"
+
+    @property
+    def native_value(self):
+        return self._device.ubus_stats["requests"]
+
+    @property
+    def extra_state_attributes(self):
+        stats = self._device.ubus_stats
+        return dict(
+            calls=stats["calls"],
+            bytes_sent=stats["bytes_sent"],
+            bytes_received=stats["bytes_received"],
+            logins=stats["logins"],
+        )
+
+    @property
+    def state_class(self):
+        return "total_increasing"
+
+
+class UbusLatencySensor(OpenWrtSensor):
+
+    def __init__(self, device, device_id: str):
+        super().__init__(device, device_id)
+        self._attr_entity_category = EntityCategory.DIAGNOSTIC
+        self._attr_entity_registry_enabled_default = False
+        self._attr_icon = "mdi:timer-outline"
+        self._attr_device_class = SensorDeviceClass.DURATION
+        self._attr_native_unit_of_measurement = "ms"
+
+    @property
+    def unique_id(self):
+        return "%s.ubus_latency" % (super().unique_id)
+
+    @property
+    def name(self):
+        return f"{super().name} Ubus latency p95"
+
+    @property
+    def native_value(self):
+        return self._device.ubus_stats["latency"]["p95"]
+
+    @property
+    def extra_state_attributes(self):
+        latency = self._device.ubus_stats["latency"]
+        return dict(
+            p50=latency["p50"],
+            max=latency["max"],
+            polls=self._device.poll_latency,
+        )
+
+
+class UbusErrorsSensor(OpenWrtSensor):
+
+    def __init__(self, device, device_id: str):
+        super().__init__(device, device_id)
+        self._attr_entity_category = EntityCategory.DIAGNOSTIC
+        self._attr_entity_registry_enabled_default = False
+        self._attr_icon = "mdi:alert-circle-outline"
+
+    @property
+    def unique_id(self):
+        return "%s.ubus_errors" % (super().unique_id)
+
+    @property
+    def name(self):
+        return f"{super().name} Ubus errors"
+
+    @property
+    def native_value(self):
+        return self._device.ubus_stats["errors"]
 
     @property
     def extra_state_attributes(self):
-        return dict(mac=self._data.get("mac"), speed=self._data.get("speed"))
+        return dict(self._device.ubus.stats.errors)
 
     @property
     def state_class(self):
         return "total_increasing"
+
+
+class PollIntervalSensor(OpenWrtSensor):
+
+    def __init__(self, device, device_id: str):
+        super().__init__(device, device_id)
+        self._attr_entity_category = EntityCategory.DIAGNOSTIC
+        self._attr_entity_registry_enabled_default = False
+        self._attr_icon = "mdi:timer-sync-outline"
+        self._attr_device_class = SensorDeviceClass.DURATION
+        self._attr_native_unit_of_measurement = "s"
+
+    @property
+    def unique_id(self):
+        return "%s.poll_interval" % (super().unique_id)
+
+    @property
+    def name(self):
+        return f"{super().name} Poll interval"
+
+    @property
+    def native_value(self):
+        return self._device.poll_stats["poll_interval"]
+
+    @property
+    def extra_state_attributes(self):
+        stats = self._device.poll_stats
+        return dict(
+            poll_duration=stats["poll_duration"],
+            consecutive_failures=stats["consecutive_failures"],
+            load=stats["load"],
+        )
@@ -0,0 +1,145 @@
+from collections import Counter, deque
+
+DEFAULT_WINDOW: int = 256
+RATE_SAMPLES: int = 16
+RATE_SPAN: int = 300
+COUNTER_32: int = 1 << 32
+
+
+class LatencyWindow:
+    """Most recent latency samples (seconds), summarized on demand."""
+
+    def __init__(self, size: int = DEFAULT_WINDOW):
+        self._samples = deque(maxlen=size)
+        self.count = 0
+
+    def add(self, value: float):
+        self._samples.append(value)
+        self.count += 1
+
+    def _percentile(self, ordered: list, ratio: float) -> float:
+        return ordered[min(len(ordered) - 1, int(len(ordered) * ratio))]
+
+    @property
+    def summary(self) -> dict:
+        if not self._samples:
+            return dict(count=self.count, p50=None, p95=None, max=None)
+        ordered = sorted(self._samples)
+        return dict(
+            count=self.count,
+            p50=round(self._percentile(ordered, 0.5) * 1000, 1),
+            p95=round(self._percentile(ordered, 0.95) * 1000, 1),
+            max=round(ordered[-1] * 1000, 1),
+        )
+
+
+class UbusStats:
+    """Per-router traffic counters kept by Ubus, latencies are reported in ms."""
+
+    def __init__(self):
+        self.requests = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.logins = 0
+        self.calls = Counter()
+        self.errors = Counter()
+        self.latency = LatencyWindow()
+        self.call_latency = {}
+
+    def record_request(self, sent: int, received: int, latency: float, calls):
+        self.requests += 1
+        self.bytes_sent += sent
+        self.bytes_received += received
+        self.latency.add(latency)
+        for call in calls:
+            self.calls[call] += 1
+            if call not in self.call_latency:
+                self.call_latency[call] = LatencyWindow(64)
+            self.call_latency[call].add(latency)
+
+    def record_error(self, err: Exception):
+        self.errors[type(err).__name__] += 1
+
+    @property
+    def summary(self) -> dict:
+        return dict(
+            requests=self.requests,
+            calls=sum(self.calls.values()),
+            bytes_sent=self.bytes_sent,
+            bytes_received=self.bytes_received,
+            logins=self.logins,
+            errors=sum(self.errors.values()),
+            latency=self.latency.summary,
+        )
+
+    @property
+    def details(self) -> dict:
+        return dict(
+            **self.summary,
+            errors_by_class=dict(self.errors),
+            calls_by_method={
+                call: dict(self.call_latency[call].summary, count=count)
+                for call, count in self.calls.most_common()
+            },
+        )
+
+
+def counter_delta(old: int, new: int, reset: bool = False) -> int:
+    """Bytes counted between two readings of a network counter.
+
+    After a `reset` (router reboot) the counter started again from zero.
+    Otherwise a 32-bit counter that was past half its range wrapped around,
+    anything else going backwards was reset (device recreated) as well.
+    """
+    if reset:
+        return new
+    if new >= old:
+        return new - old
+    if COUNTER_32 // 2 < old < COUNTER_32:
+        return new + COUNTER_32 - old
+    return new
+
+
+class RateWindow:
+    """Recent (time, rx, tx) byte counter samples of a network device, as bit rates."""
+
+    def __init__(self, size: int = RATE_SAMPLES, span: float = RATE_SPAN):
+        # Counters are accumulated across wraps and resets so any two samples can be compared
+        self._samples = deque(maxlen=size)
+        self._span = span
+        self._last = None
+
+    def add(self, now: float, rx: int, tx: int, reset: bool = False):
+        """Add a counter reading, `reset` when the counters restarted since the last one."""
+        if self._last is None:
+            totals = (0, 0)
+        else:
+            _, rx_total, tx_total = self._samples[-1]
+            totals = (
+                rx_total + counter_delta(self._last[0], rx, reset),
+                tx_total + counter_delta(self._last[1], tx, reset),
+            )
+        self._last = (rx, tx)
+        self._samples.append((now, *totals))
+        while len(self._samples) > 2 and now - self._samples[0][0] > self._span:
+            self._samples.popleft()
+
+    def _rate(self, first: tuple, last: tuple) -> tuple:
+        elapsed = last[0] - first[0]
+        if elapsed <= 0:
+            return None, None
+        return round((last[1] - first[1]) * 8 / elapsed), round((last[2] - first[2]) * 8 / elapsed)
+
+    @property
+    def instant(self) -> tuple:
+        """Rx and tx bit/s since the previous sample."""
+        if len(self._samples) < 2:
+            return None, None
+        return self._rate(self._samples[-2], self._samples[-1])
+
+    @property
+    def average(self) -> tuple:
+        """Rx and tx bit/s over the whole window."""
+        if len(self._samples) < 2:
+            return None, None
+        return self._rate(self._samples[0], self._samples[-1])
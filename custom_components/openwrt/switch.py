@@ -5,7 +5,7 @@ from homeassistant.helpers.entity import EntityCategory
 
 import logging
 
-from . import OpenWrtEntity
+from . import OpenWrtEntity, async_track_entities
 from .constants import DOMAIN
 
 _LOGGER = logging.getLogger(__name__)
@@ -16,21 +16,21 @@ async def async_setup_entry(
     entry: ConfigEntry,
     async_add_entities
 ) -> None:
-    entities = []
     data = entry.as_dict()
     device = hass.data[DOMAIN]['devices'][entry.entry_id]
     device_id = data['data']['id']
-    for net_id, info in device.coordinator.data['wireless'].items():
-        if "wps" in info:
-            sensor = WirelessWpsSwitch(device, device_id, net_id)
-            entities.append(sensor)
-    async_add_entities(entities)
+    async_track_entities(
+        hass, entry, device, async_add_entities,
+        lambda state: [net_id for net_id, info in state.wireless.items() if info.wps is not None],
+        lambda net_id: [WirelessWpsSwitch(device, device_id, net_id)],
+    )
     return True
 
 
 class WirelessWpsSwitch(OpenWrtEntity, SwitchEntity):
     def __init__(self, device, device_id, interface: str):
         super().__init__(device, device_id)
+        self._inputs = (("wireless", interface),)
         self._interface_id = interface
 
     @property
@@ -41,17 +41,24 @@ class WirelessWpsSwitch(OpenWrtEntity, SwitchEntity):
     def name(self):
         return "%s Wireless [%s] WPS toggle" % (super().name, self._interface_id)
 
+    @property
+    def available(self):
+        return super().available and self.data.wireless[self._interface_id].wps is not None
+
     @property
     def is_on(self):
-        return self.data["wireless"][self._interface_id]["wps"]
+        info = self.data.wireless.get(self._interface_id)
+        return info.wps if info else None
 
     async def async_turn_on(self, **kwargs):
         await self._device.set_wps(self._interface_id, True)
-        self.data["wireless"][self._interface_id]["wps"] = True
+        self.data.wireless[self._interface_id].wps = True
+        self.async_write_ha_state()
 
     async def async_turn_off(self, **kwargs):
         await self._device.set_wps(self._interface_id, False)
-        self.data["wireless"][self._interface_id]["wps"] = False
+        self.data.wireless[self._interface_id].wps = False
+        self.async_write_ha_state()
 
     @property
     def icon(self):
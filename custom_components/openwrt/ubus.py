@@ -1,65 +1,253 @@
 from homeassistant.exceptions import IntegrationError
+import asyncio
 import json
 import logging
-import typing
+import time
 
-import requests
+import aiohttp
+
+from .stats import UbusStats
+from .scheduler import RequestScheduler, PRIORITY_INTERACTIVE, PRIORITY_POLL
+from .logs import trace
 
 _LOGGER = logging.getLogger(__name__)
 
 DEFAULT_TIMEOUT: int = 15
+DEFAULT_MAX_CONCURRENCY: int = 2
+SESSION_RENEW_MARGIN: int = 30
+SESSION_SAVE_DELAY: int = 60
+ANONYMOUS_SESSION: str = "00000000000000000000000000000000"
+
+# Calls without side effects, identical concurrent calls of these share a response
+READ_ONLY_CALLS: dict = {
+    "system": {"board", "info"},
+    "network.wireless": {"status"},
+    "network.device": {"status"},
+    "network.interface": {"dump", "status"},
+    "iwinfo": {"info", "assoclist", "devices", "freqlist", "txpowerlist", "countrylist"},
+    "hostapd.*": {"get_clients", "get_status", "wps_status"},
+    "mwan3": {"status"},
+    "luci-rpc": {"getBoardJSON", "getNetworkDevices", "getWirelessDevices", "getDHCPLeases"},
+    "hass": {"snapshot"},
+}
 
 class Ubus:
     def __init__(
         self,
-        executor_job: typing.Callable,
+        session: aiohttp.ClientSession,
         url: str,
         username: str,
         password: str,
         timeout: int = DEFAULT_TIMEOUT,
-        verify: bool = True
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        session_store=None,
     ):
-        self.executor_job = executor_job
+        self.session = session
         self.url = url
         self.username = username
         self.password = password
-        self.timeout = timeout
-        self.verify = verify
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
         self.session_id = ""
+        self.session_timeout = 0
+        self.session_expires = 0
         self.rpc_id = 1
+        self.batch_supported = True
+        self.scheduler = RequestScheduler(max_concurrency)
+        self._login_lock = asyncio.Lock()
+        self._session_store = session_store
+        self._inflight = {}
+        self.stats = UbusStats()
+
+    @staticmethod
+    def is_read_only(subsystem: str, method: str, rpc_method: str = "call") -> bool:
+        if rpc_method == "list":
+            return True
+        if rpc_method != "call":
+            return False
+        methods = READ_ONLY_CALLS.get(subsystem)
+        if methods is None and subsystem and "." in subsystem:
+            methods = READ_ONLY_CALLS.get(subsystem.split(".", 1)[0] + ".*")
+        return bool(methods) and method in methods
+
+    def _coalesce_key(self, rpc_method: str, subsystem: str, method: str, params: dict):
+        """Key identifying a read-only call, None for calls that must never be merged."""
+        if not self.is_read_only(subsystem, method, rpc_method):
+            return None
+        return (rpc_method, subsystem, method, json.dumps(params, sort_keys=True))
+
+    def _find_inflight(self, key: tuple, priority: int):
+        """In-flight call for `key` of the same or a higher priority.
+
+        A caller in a hurry never joins, and so never waits behind, a queued poll.
+        """
+        for level in range(priority + 1):
+            if (future := self._inflight.get((level, *key))) is not None:
+                return future
+        return None
 
     async def api_call(
         self,
         subsystem: str,
         method: str,
         params: dict,
-        rpc_method: str = "call"
+        rpc_method: str = "call",
+        priority: int = None,
     ) -> dict:
-        _LOGGER.debug(f"Starting api_call with subsystem: {subsystem}, method: {method}, params: {params}")
+        """Run one call, by default writes are interactive and reads are polling."""
+        _LOGGER.debug("Starting api_call %s / %s", subsystem, method)
+        if priority is None:
+            priority = PRIORITY_POLL if self.is_read_only(subsystem, method, rpc_method) else PRIORITY_INTERACTIVE
+        key = self._coalesce_key(rpc_method, subsystem, method, params)
+        if key is None:
+            return await self._call_with_session(rpc_method, subsystem, method, params, priority)
+        if (joined := self._find_inflight(key, priority)) is not None:
+            _LOGGER.debug("Joining in-flight call %s / %s", subsystem, method)
+            result = await asyncio.shield(joined)
+        else:
+            key = (priority, *key)
+            future = self._inflight[key] = asyncio.get_running_loop().create_future()
+            result = ConnectionError(f"RPC error: {subsystem} / {method} was interrupted")
+            try:
+                result = await self._call_with_session(rpc_method, subsystem, method, params, priority)
+            except (PermissionError, NameError, ConnectionError) as err:
+                result = err
+            finally:
+                self._inflight.pop(key, None)
+                future.set_result(result)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    async def _call_with_session(
+        self,
+        rpc_method: str,
+        subsystem: str,
+        method: str,
+        params: dict,
+        priority: int = PRIORITY_POLL,
+    ) -> dict:
+        session_id = await self._ensure_session(priority)
         try:
-            if self.session_id:
-                return await self._api_call(rpc_method, subsystem, method, params)
+            return await self._api_call(rpc_method, subsystem, method, params, priority=priority)
         except PermissionError as err:
-            _LOGGER.error(f"PermissionError during api_call: {err}")
+            _LOGGER.warning(f"PermissionError during api_call, logging in again: {err}")
         except NameError as err:
             _LOGGER.error(f"NameError during api_call: {err}")
             return {}  # Return an empty dict if the object is not found
 
-        await self._login()
-        return await self._api_call(rpc_method, subsystem, method, params)
+        await self._login(session_id, priority)
+        return await self._api_call(rpc_method, subsystem, method, params, priority=priority)
 
-    async def _login(self):
-        _LOGGER.debug("Logging in to Ubus...")
-        result = await self._api_call(
-            "call",
-            "session",
-            "login",
-            dict(username=self.username, password=self.password),
-            "00000000000000000000000000000000")
-        _LOGGER.debug(f"Login result: {result}")
-        self.session_id = result["ubus_rpc_session"]
+    async def async_restore_session(self):
+        """Reuse a session saved by a previous run if rpcd still considers it valid."""
+        if not self._session_store:
+            return
+        stored = await self._session_store.async_load()
+        if not stored or stored.get("url") != self.url or stored.get("username") != self.username:
+            return
+        if stored.get("expires", 0) - SESSION_RENEW_MARGIN > time.time():
+            self.session_id = stored["session_id"]
+            self.session_timeout = stored.get("timeout", 0)
+            self.session_expires = stored["expires"]
+            _LOGGER.debug("Restored Ubus session for [%s]", self.url)
 
-    async def _api_call(
+    def _session_data(self) -> dict:
+        return dict(
+            url=self.url,
+            username=self.username,
+            session_id=self.session_id,
+            timeout=self.session_timeout,
+            expires=self.session_expires,
+        )
+
+    def _touch_session(self):
+        # rpcd extends the session timeout on every authorized call
+        if not self.session_timeout:
+            return
+        self.session_expires = time.time() + self.session_timeout
+        if self._session_store:
+            self._session_store.async_delay_save(self._session_data, SESSION_SAVE_DELAY)
+
+    def _session_valid(self) -> bool:
+        if not self.session_id:
+            return False
+        return not self.session_expires or self.session_expires - SESSION_RENEW_MARGIN > time.time()
+
+    async def _ensure_session(self, priority: int = PRIORITY_POLL) -> str:
+        """Log in if there is no session or it is about to expire, return the session in use."""
+        if not self._session_valid():
+            await self._login(self.session_id, priority)
+        return self.session_id
+
+    async def _login(self, expired: str = "", priority: int = PRIORITY_POLL):
+        """Replace the `expired` session, concurrent callers share a single login."""
+        async with self._login_lock:
+            if self.session_id != expired and self._session_valid():
+                return
+            _LOGGER.debug("Logging in to Ubus...")
+            self.stats.logins += 1
+            result = await self._api_call(
+                "call",
+                "session",
+                "login",
+                dict(username=self.username, password=self.password),
+                ANONYMOUS_SESSION,
+                priority)
+            _LOGGER.debug("Logged in to [%s], session timeout %s", self.url, result.get("timeout"))
+            self.session_id = result["ubus_rpc_session"]
+            self.session_timeout = result.get("timeout", 0)
+            self.session_expires = time.time() + result.get("expires", self.session_timeout) if self.session_timeout else 0
+            if self._session_store:
+                await self._session_store.async_save(self._session_data())
+
+    async def api_batch(self, calls: list, priority: int = PRIORITY_POLL) -> list:
+        """Run several (subsystem, method, params) calls in a single JSON-RPC batch.
+
+        Returns a list aligned with `calls` holding either the call result or
+        the exception raised for that particular call.
+        """
+        _LOGGER.debug("Starting api_batch with %d calls", len(calls))
+        results = [None] * len(calls)
+        shared = {}
+        owned = {}
+        for idx, call in enumerate(calls):
+            key = self._coalesce_key("call", *call)
+            if key is None:
+                continue
+            if (future := self._find_inflight(key, priority)) is not None:
+                shared[idx] = future
+            else:
+                owned[idx] = (priority, *key)
+                self._inflight[owned[idx]] = asyncio.get_running_loop().create_future()
+        pending = [idx for idx in range(len(calls)) if idx not in shared]
+        try:
+            batch = await self._batch_with_session([calls[idx] for idx in pending], priority)
+            for idx, item in zip(pending, batch):
+                results[idx] = item
+        finally:
+            for idx, key in owned.items():
+                future = self._inflight.pop(key)
+                interrupted = ConnectionError(f"RPC error: {calls[idx][0]} / {calls[idx][1]} was interrupted")
+                future.set_result(results[idx] if results[idx] is not None else interrupted)
+        for idx, future in shared.items():
+            results[idx] = await asyncio.shield(future)
+        return results
+
+    async def _batch_with_session(self, calls: list, priority: int) -> list:
+        if not calls:
+            return []
+        session_id = await self._ensure_session(priority)
+        results = await self._api_batch(calls, priority)
+        expired = [idx for idx, item in enumerate(results) if isinstance(item, PermissionError)]
+        if expired:
+            _LOGGER.warning(f"PermissionError during api_batch, logging in again: {results[expired[0]]}")
+            await self._login(session_id, priority)
+            retried = await self._api_batch([calls[idx] for idx in expired], priority)
+            for idx, item in zip(expired, retried):
+                results[idx] = item
+        return results
+
+    def _make_request(
         self,
         rpc_method: str,
         subsystem: str,
@@ -74,42 +262,53 @@ class Ubus:
             _params.append(params)
         else:
             _params.append({})
-        data = json.dumps(
-            {
-                "jsonrpc": "2.0",
-                "id": self.rpc_id,
-                "method": rpc_method,
-                "params": _params,
-            }
-        )
-        _LOGGER.debug(f'New API call to [{self.url}] with data: {data}')
+        request = {
+            "jsonrpc": "2.0",
+            "id": self.rpc_id,
+            "method": rpc_method,
+            "params": _params,
+        }
         self.rpc_id += 1
+        return request
+
+    async def _post(self, data: str, calls: list, priority: int = PRIORITY_POLL):
+        trace("Request to [%s]: %s", self.url, data)
         try:
-            def post():
-                return requests.post(
+            async with self.scheduler.slot(priority):
+                started = time.monotonic()
+                async with self.session.post(
                     self.url,
                     data=data,
+                    headers={"Content-Type": "application/json"},
                     timeout=self.timeout,
-                    verify=self.verify
-                )
-            response = await self.executor_job(post)
-        except Exception as err:
+                ) as response:
+                    status = response.status
+                    body = await response.read()
+                self.stats.record_request(len(data), len(body), time.monotonic() - started, calls)
+            json_response = json.loads(body) if status == 200 else None
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as err:
             _LOGGER.error(f"api_call exception: {err}")
+            self.stats.record_error(err)
             raise ConnectionError from err
 
-        if response.status_code != 200:
-            _LOGGER.error(f"api_call http error: {response.status_code}")
-            raise ConnectionError(f"HTTP error: {response.status_code}")
+        if status != 200:
+            _LOGGER.error(f"api_call http error: {status}")
+            err = ConnectionError(f"HTTP error: {status}")
+            self.stats.record_error(err)
+            raise err
 
-        json_response = response.json()
-        _LOGGER.debug(f'Raw JSON response from [{self.url}]: {json_response}')
+        trace("Response from [%s]: %s", self.url, json_response)
+        return json_response
 
+    def _parse_response(self, rpc_method: str, json_response: dict) -> dict:
         if "error" in json_response:
             code = json_response['error'].get('code')
             message = json_response['error'].get('message')
-            _LOGGER.error(f"api_call RPC error: {json_response['error']}")
             if code == -32002:
+                # Expired session, handled by the caller logging in again
+                _LOGGER.debug("api_call RPC error: %s", json_response['error'])
                 raise PermissionError(message)
+            _LOGGER.error(f"api_call RPC error: {json_response['error']}")
             if code == -32000:
                 raise NameError(message)
             raise ConnectionError(f"RPC error: {message}")
@@ -126,5 +325,105 @@ class Ubus:
             return json_response['result'][1] if len(result) > 1 else {}
         raise ConnectionError(f"RPC error: {result[0]}")
 
+    async def _api_call(
+        self,
+        rpc_method: str,
+        subsystem: str,
+        method: str,
+        params: dict,
+        session: str = None,
+        priority: int = PRIORITY_POLL,
+    ) -> dict:
+        request = self._make_request(rpc_method, subsystem, method, params, session)
+        json_response = await self._post(json.dumps(request), [f"{subsystem}.{method}" if method else rpc_method], priority)
+        try:
+            result = self._parse_response(rpc_method, json_response)
+        except (PermissionError, NameError, ConnectionError) as err:
+            self.stats.record_error(err)
+            raise
+        if not session:
+            self._touch_session()
+        return result
+
+    async def _api_batch(self, calls: list, priority: int = PRIORITY_POLL) -> list:
+        if not self.batch_supported:
+            return await self._api_gather(calls, priority)
+        requests = [self._make_request("call", *call) for call in calls]
+        json_response = await self._post(json.dumps(requests), [f"{call[0]}.{call[1]}" for call in calls], priority)
+        if not isinstance(json_response, list):
+            # Older uhttpd-mod-ubus answers a batch with a single error object
+            _LOGGER.warning(f"Batch requests are not supported by [{self.url}]: {json_response}")
+            self.batch_supported = False
+            return await self._api_gather(calls, priority)
+        responses = {item.get("id"): item for item in json_response}
+        results = []
+        for request in requests:
+            response = responses.get(request["id"])
+            try:
+                if response is None:
+                    raise ConnectionError(f"RPC error: missing response for id {request['id']}")
+                results.append(self._parse_response("call", response))
+            except (PermissionError, NameError, ConnectionError) as err:
+                self.stats.record_error(err)
+                results.append(err)
+        if not all(isinstance(item, PermissionError) for item in results):
+            self._touch_session()
+        return results
+
+    async def _api_gather(self, calls: list, priority: int = PRIORITY_POLL) -> list:
+        """Fallback for api_batch(): one request per call, run concurrently."""
+        async def run(call):
+            try:
+                return await self._api_call("call", *call, priority=priority)
+            except (PermissionError, NameError, ConnectionError) as err:
+                return err
+        return list(await asyncio.gather(*[run(call) for call in calls]))
+
+    async def subscribe(self, path: str, on_connect=None, read_timeout: float = None):
+        """Yield (event, data) pairs from the rpcd event stream of a ubus object.
+
+        The stream stays open until the router closes it or sends nothing
+        for `read_timeout` seconds (raises asyncio.TimeoutError), the session
+        is not refreshed while it is open.
+        """
+        session_id = await self._ensure_session()
+        url = f"{self.url}/subscribe/{path}"
+        _LOGGER.debug("Subscribing to [%s]", url)
+        streaming = False
+        try:
+            async with self.session.get(
+                url,
+                headers={"Authorization": f"Bearer {session_id}", "Accept": "text/event-stream"},
+                timeout=aiohttp.ClientTimeout(total=None, sock_connect=self.timeout.total, sock_read=read_timeout),
+            ) as response:
+                if response.status in (401, 403):
+                    raise PermissionError(f"Subscribe to {path} denied: {response.status}")
+                if response.status != 200:
+                    raise ConnectionError(f"HTTP error: {response.status}")
+                if on_connect:
+                    on_connect()
+                streaming = True
+                event = None
+                async for raw in response.content:
+                    line = raw.decode("utf-8", "replace").rstrip("\r\n")
+                    if not line:
+                        event = None
+                    elif line.startswith("event:"):
+                        event = line[6:].strip()
+                    elif line.startswith("data:"):
+                        try:
+                            data = json.loads(line[5:])
+                        except ValueError:
+                            _LOGGER.debug("Ignoring malformed event from [%s]: %s", url, line)
+                            continue
+                        yield event, data
+        except aiohttp.ServerTimeoutError as err:
+            if not streaming:
+                # Connect timeouts are ServerTimeoutError too, the router is unreachable
+                raise ConnectionError(f"Subscribe to {path} timed out") from err
+            raise asyncio.TimeoutError(f"No data from {path} for {read_timeout} seconds") from err
+        except aiohttp.ClientError as err:
+            raise ConnectionError from err
+
     async def api_list(self):
-        return await self.api_call("*", None, None, "list")
\ No newline at end of file
+        return await self.api_call("*", None, None, "list")
@@ -0,0 +1,77 @@
+"""The hass.snapshot plugin path must give the same state as regular polling."""
+import asyncio
+import os
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from homeassistant.core import HomeAssistant  # noqa: E402
+
+from custom_components.openwrt.clients import ClientIndex  # noqa: E402
+from custom_components.openwrt.coordinator import new_coordinator  # noqa: E402
+from custom_components.openwrt.mesh import MeshRegistry  # noqa: E402
+from fake_rpcd import FakeRouter, FakeRpcd  # noqa: E402
+
+
+def router_config(index: int, router: FakeRouter, server: FakeRpcd) -> dict:
+    address, port, path = server.url(index)
+    return dict(
+        id=f"test{index}",
+        address=address,
+        port=port,
+        path=path,
+        https=False,
+        verify_cert=False,
+        username="hass",
+        password="test",
+        wps=True,
+        wan_devices=",".join(router.wan),
+    )
+
+
+async def poll(tmp_path, snapshot: bool):
+    # Two routers in one mesh group, so each has a peer to look up
+    routers = [FakeRouter(i, aps=2, clients=3, mesh_group=2, snapshot=snapshot) for i in range(2)]
+    server = FakeRpcd(routers, 0, 0, True)
+    await server.start()
+    hass = HomeAssistant(str(tmp_path / ("snapshot" if snapshot else "batch")))
+    mesh = MeshRegistry()
+    devices = [
+        new_coordinator(hass, router_config(i, router, server), mesh, ClientIndex(), f"test{i}")
+        for i, router in enumerate(routers)
+    ]
+    try:
+        for device in devices:
+            device.discovery_coordinator.async_set_updated_data(await device.async_update_discovery())
+        # The first round fills the mesh registry, the second one reads the peers
+        for _ in range(2):
+            for device in devices:
+                device.coordinator.async_set_updated_data(await device.async_update_fast())
+        routers[0].requests = routers[0].calls = 0
+        state = await devices[0].async_update_fast()
+        return devices[0].snapshot_supported, state, routers[0].requests
+    finally:
+        for device in devices:
+            await device.async_shutdown()
+        await hass.async_stop(force=True)
+        await server.stop()
+
+
+def test_snapshot_matches_batch(tmp_path):
+    supported, batch, _ = asyncio.run(poll(tmp_path, False))
+    assert not supported
+    supported, snapshot, requests = asyncio.run(poll(tmp_path, True))
+    assert supported
+    assert requests == 1
+
+    assert snapshot.wireless == batch.wireless
+    assert snapshot.mesh == batch.mesh
+    assert snapshot.mwan3 == batch.mwan3
+    assert snapshot.load == batch.load
+    assert batch.wireless and batch.mesh and batch.mwan3 and batch.wan
+    assert any(info.peers for info in batch.mesh.values())
+    for name, counters in batch.wan.items():
+        assert (snapshot.wan[name].up, snapshot.wan[name].rx_bytes, snapshot.wan[name].tx_bytes) == \
+            (counters.up, counters.rx_bytes, counters.tx_bytes)